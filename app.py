@@ -1,11 +1,31 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, Response, render_template, request, jsonify, stream_with_context
 from flask_sqlalchemy import SQLAlchemy
 from config import Config
-from datetime import datetime
-from models import db, Project, ProjectDocument, Conversation, AIProvider, AIAgentConfig, ProjectJournal, ProjectScope, ProjectHLD, ProjectLLD, ProjectMasterLLD, CodingPlan, UnitTest
+from datetime import datetime, timedelta
+from models import db, BLOB_CODECS, collect_unused_blobs, compact_content, configure_sqlite, create_schema, schema_lock, ContentBlob, Project, ProjectLike, ProjectDocument, Conversation, AIProvider, AIAgentConfig, ProjectJournal, ProjectScope, ProjectHLD, ProjectLLD, ProjectMasterLLD, CodingPlan, UnitTest, PipelineJob
+from config_cache import ConfigCache
+from events import EventBroker, ensure_event_log, prune_events
+from data_transfer import ImportConflict, export_lines, export_tables, gzip_chunks, import_lines
+from http_cache import cached_json
+from jobs import JobQueue
+from prompt_context import ContextBuilder, render_prompt
+from provider_clients import ProviderClients
+from response_cache import ResponseCache
+from revisions import REVISIONED_ARTIFACTS, RevisionStore
+from search import SEARCH_KINDS, ensure_search_index, search
+from structured_logging import Truncated, configure_logging
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
+import gzip
+import hashlib
+import io
+import queue
 import requests
-from sqlalchemy import desc
+import http_cache
+import metrics
+from sqlalchemy import and_, desc, func, or_, select, update
+from sqlalchemy.exc import IntegrityError, OperationalError
 
 # Update the Project model
 class Project(db.Model):
@@ -17,12 +37,38 @@ class Project(db.Model):
     ai_agents = db.Column(db.Text)
     rating_sum = db.Column(db.Integer, default=0)
     rating_count = db.Column(db.Integer, default=0)
-    average_rating = db.Column(db.Float, default=0.0)
-    likes = db.Column(db.JSON, default=[])
+    average_rating = db.Column(db.Float, default=0.0, index=True)
+    likes_count = db.Column(db.Integer, default=0)  # Maintained with ProjectLike rows
 
 app = Flask(__name__)
 app.config.from_object(Config)
+configure_logging(app)
+# extra= for high-volume log lines (payloads and responses) that are only sampled
+SAMPLED_LOG = {'sample_rate': app.config['LOG_SAMPLE_RATE']}
 db.init_app(app)
+with app.app_context():
+    configure_sqlite(db.engine, app.config['SQLITE_PRAGMAS'])
+    metrics.init_app(app, db.engine)
+http_cache.init_app(app)
+
+ContentBlob.min_size = app.config['BLOB_MIN_SIZE']
+ContentBlob.codec_name = app.config['BLOB_COMPRESSION']
+if ContentBlob.codec_name not in BLOB_CODECS:
+    app.logger.warning("BLOB_COMPRESSION=%s is unavailable (zstd needs the zstandard package); using zlib",
+                       ContentBlob.codec_name)
+    ContentBlob.codec_name = 'zlib'
+
+journal_jobs = JobQueue(app, workers=app.config['JOURNAL_WORKERS'])
+cleanup_jobs = JobQueue(app, workers=1)
+provider_clients = ProviderClients.from_config(app.config)
+config_cache = ConfigCache.from_config(app.config)
+context_builder = ContextBuilder.from_config(app.config)
+consult_executor = ThreadPoolExecutor(max_workers=app.config['CONSULT_WORKERS'], thread_name_prefix='consult')
+pipeline_jobs = JobQueue(app, workers=app.config['PIPELINE_WORKERS'])
+pipeline_executor = ThreadPoolExecutor(max_workers=app.config['PIPELINE_FANOUT'], thread_name_prefix='pipeline')
+response_cache = ResponseCache.from_config(app.config, os.path.join(app.instance_path, 'response_cache.db'))
+revision_store = RevisionStore.from_config(app.config)
+event_broker = EventBroker(app, poll_interval=app.config['EVENT_POLL_INTERVAL'])
 
 AGENT_TYPES = ['Project Assistant', 'Project Writer', 'Project Software Architect', 'Project UX SME', 'Project DB SME', 'Project Dev SME', 'Project Tester SME', 'Project Web Researcher', 'Project Coder', 'Project Tester']
 
@@ -70,19 +116,31 @@ Remember to maintain a patient and methodical approach, allowing the user to res
     'Project Tester': "You are a Project Tester AI. Your role is to assist in defining unit tests for project components. Help create comprehensive test cases, identify edge cases, and ensure proper test coverage for the project's codebase."
 }
 
+DEFAULT_PROVIDERS = [
+    {"name": "Ollama", "api_url": "http://localhost:11434/api/chat"},
+    {"name": "OpenAI", "api_url": "https://api.openai.com/v1/chat/completions"},
+    {"name": "Anthropic", "api_url": "https://api.anthropic.com/v1/complete"},
+    {"name": "OpenRouter", "api_url": "https://openrouter.ai/api/v1/chat/completions"}
+]
+
 def init_db():
     with app.app_context():
-        db.create_all()
+        with schema_lock():
+            create_schema()
+            search_available = ensure_search_index()
+            events_available = ensure_event_log(app.config['EVENT_STREAMS_ENABLED'])
+        if not search_available:
+            app.logger.warning("Full-text search is unavailable (requires SQLite with FTS5)")
+        if not events_available:
+            app.logger.warning("Project event streams are unavailable (requires SQLite)")
+        schedule_pending_purges()
+        fail_stale_pipeline_jobs()
+        cleanup_jobs.submit(('compact_content',), compact_content, app.config['CLEANUP_BATCH_SIZE'])
+        schedule_blob_gc()
+        schedule_event_prune()
         
         # Add default AI providers if they don't exist
-        default_providers = [
-            {"name": "Ollama", "api_url": "http://localhost:11434/api/chat"},
-            {"name": "OpenAI", "api_url": "https://api.openai.com/v1/chat/completions"},
-            {"name": "Anthropic", "api_url": "https://api.anthropic.com/v1/complete"},
-            {"name": "OpenRouter", "api_url": "https://openrouter.ai/api/v1/chat/completions"}
-        ]
-        
-        for provider in default_providers:
+        for provider in DEFAULT_PROVIDERS:
             existing_provider = AIProvider.query.filter_by(name=provider["name"]).first()
             if not existing_provider:
                 new_provider = AIProvider(name=provider["name"], api_url=provider["api_url"])
@@ -93,7 +151,13 @@ def init_db():
 @app.route('/')
 def index():
     app.logger.debug("Index route hit")
-    return render_template('index.html')
+    # The page only changes with a deploy, and its static URLs carry content
+    # hashes, so repeat loads are a 304 and the assets come from the browser cache
+    response = Response(render_template('index.html', event_streams=app.config['EVENT_STREAMS_ENABLED']),
+                        mimetype='text/html')
+    response.add_etag()
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
 
 import json
 
@@ -105,8 +169,7 @@ def projects():
             name=data['name'],
             description=data.get('description', ''),
             main_features=', '.join(data.get('main_features', [])),
-            ai_agents=json.dumps(data.get('ai_agents', [])),
-            likes=[]
+            ai_agents=json.dumps(data.get('ai_agents', []))
         )
         db.session.add(new_project)
         db.session.commit()
@@ -117,23 +180,139 @@ def projects():
             "main_features": new_project.main_features,
             "ai_agents": json.loads(new_project.ai_agents),
             "average_rating": new_project.average_rating,
-            "likes_count": len(new_project.likes)
+            "likes_count": new_project.likes_count or 0
         }), 201
     else:
-        projects = Project.query.all()
-        return jsonify([{
-            "id": p.id,
-            "name": p.name,
-            "description": p.description or '',
-            "main_features": p.main_features.split(', ') if p.main_features else [],
-            "ai_agents": json.loads(p.ai_agents) if p.ai_agents else [],
-            "average_rating": p.average_rating,
-            "likes_count": len(p.likes)
-        } for p in projects])
+        return list_projects()
+
+PROJECT_PAGE_SIZE = 100
+MAX_PROJECT_PAGE_SIZE = 500
+PROJECT_DESCRIPTION_EXCERPT = 300
+PROJECT_SORT_COLUMNS = {
+    'id': Project.id,
+    'name': Project.name,
+    'rating': Project.average_rating,
+    'last_updated': Project.last_updated,
+}
+
+def list_projects():
+    """One page of the project list, selecting only the columns the list shows.
+
+    The ETag is derived from a single aggregate over the project table (row
+    count, newest id and newest last_updated, which rating, like and edit
+    writes all bump) plus the paging parameters, so an unchanged list is
+    answered with 304 before any rows are fetched or serialized.
+    """
+    sort = request.args.get('sort', 'id')
+    if sort not in PROJECT_SORT_COLUMNS:
+        return jsonify({"error": "Invalid sort", "sorts": list(PROJECT_SORT_COLUMNS)}), 400
+    order = request.args.get('order', 'asc')
+    if order not in ('asc', 'desc'):
+        return jsonify({"error": "order must be 'asc' or 'desc'"}), 400
+    limit = max(1, min(request.args.get('limit', PROJECT_PAGE_SIZE, type=int), MAX_PROJECT_PAGE_SIZE))
+    offset = max(0, request.args.get('offset', 0, type=int))
+
+    count, max_id, max_updated = db.session.query(
+        func.count(Project.id), func.max(Project.id), func.max(Project.last_updated)
+    ).filter(Project.deleted_at.is_(None)).one()
+    etag = hashlib.sha1(f"{count}:{max_id}:{max_updated}:{sort}:{order}:{limit}:{offset}".encode()).hexdigest()
+    # Weak comparison: compressed responses carry the ETag as W/"..."
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+        response.set_etag(etag)
+        return response
+
+    column = PROJECT_SORT_COLUMNS[sort]
+    rows = db.session.query(
+        Project.id, Project.name,
+        func.substr(Project.description, 1, PROJECT_DESCRIPTION_EXCERPT).label('description'),
+        Project.average_rating, Project.likes_count, Project.last_updated
+    ).filter(Project.deleted_at.is_(None)).order_by(column.desc() if order == 'desc' else column.asc(), Project.id).limit(limit + 1).offset(offset).all()
+
+    response = jsonify([{
+        "id": row.id,
+        "name": row.name,
+        "description": row.description or '',
+        "average_rating": row.average_rating,
+        "likes_count": row.likes_count or 0,
+        "last_updated": row.last_updated.isoformat() if row.last_updated else None
+    } for row in rows[:limit]])
+    if len(rows) > limit:
+        response.headers['X-Next-Offset'] = str(offset + limit)
+    response.set_etag(etag)
+    # Let the browser keep the list but revalidate it on every load
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+def get_project_or_404(project_id):
+    """Load a project, treating soft-deleted projects as missing."""
+    return Project.query.filter_by(id=project_id, deleted_at=None).first_or_404()
+
+def purge_project(project_id):
+    """Delete a soft-deleted project's rows in small batches, then the project itself.
+
+    Each batch is its own short transaction, so purging a large project never
+    holds the SQLite write lock for long.
+    """
+    batch_size = app.config['CLEANUP_BATCH_SIZE']
+    child_tables = [table for table in reversed(db.metadata.sorted_tables)
+                    if any(fk.column.table.name == Project.__tablename__ for fk in table.foreign_keys)]
+    for table in child_tables:
+        while True:
+            batch = select(table.c.id).where(table.c.project_id == project_id).limit(batch_size)
+            deleted = db.session.execute(table.delete().where(table.c.id.in_(batch))).rowcount
+            db.session.commit()
+            if deleted < batch_size:
+                break
+            time.sleep(app.config['CLEANUP_BATCH_PAUSE'])
+    db.session.execute(Project.__table__.delete().where(Project.id == project_id, Project.deleted_at.isnot(None)))
+    db.session.commit()
+    schedule_blob_gc()
+    app.logger.info("Purged deleted project %s", project_id)
+
+next_blob_gc = 0.0
+
+def schedule_blob_gc():
+    """Queue removal of content blobs no row refers to, at most once per BLOB_GC_INTERVAL."""
+    global next_blob_gc
+    now = time.monotonic()
+    if now < next_blob_gc:
+        return
+    next_blob_gc = now + app.config['BLOB_GC_INTERVAL']
+    cleanup_jobs.submit(('blob_gc',), collect_unused_blobs, app.config['CLEANUP_BATCH_SIZE'])
+
+next_event_prune = 0.0
+
+def schedule_event_prune():
+    """Queue removal of project events older than EVENT_RETENTION, at most once per EVENT_PRUNE_INTERVAL."""
+    global next_event_prune
+    now = time.monotonic()
+    if now < next_event_prune:
+        return
+    next_event_prune = now + app.config['EVENT_PRUNE_INTERVAL']
+    cleanup_jobs.submit(('event_prune',), prune_events, app.config['EVENT_RETENTION'])
+
+@app.after_request
+def prune_after_write(response):
+    # Writes are what grow the event log, so they keep it pruned whether or not anyone is streaming
+    if request.method != 'GET':
+        schedule_event_prune()
+    return response
+
+def schedule_pending_purges():
+    # Resume purges interrupted by a restart
+    for (project_id,) in db.session.query(Project.id).filter(Project.deleted_at.isnot(None)):
+        cleanup_jobs.submit(('purge', project_id), purge_project, project_id)
+
+@app.errorhandler(IntegrityError)
+def integrity_error(e):
+    db.session.rollback()
+    app.logger.warning("Integrity error: %s", e.orig)
+    return jsonify({"error": "Request conflicts with existing data"}), 409
 
 @app.route('/api/projects/<int:project_id>', methods=['GET', 'PUT', 'DELETE'])
 def project(project_id):
-    project = Project.query.get_or_404(project_id)
+    project = get_project_or_404(project_id)
     if request.method == 'GET':
         return jsonify({
             "id": project.id,
@@ -142,7 +321,7 @@ def project(project_id):
             "main_features": project.main_features.split(', ') if project.main_features else [],
             "ai_agents": json.loads(project.ai_agents) if project.ai_agents else [],
             "average_rating": project.average_rating,
-            "likes_count": len(project.likes)
+            "likes_count": project.likes_count or 0
         })
     elif request.method == 'PUT':
         data = request.json
@@ -158,26 +337,23 @@ def project(project_id):
             "main_features": project.main_features.split(', '),
             "ai_agents": json.loads(project.ai_agents),
             "average_rating": project.average_rating,
-            "likes_count": len(project.likes)
+            "likes_count": project.likes_count or 0
         })
     elif request.method == 'DELETE':
-        # Delete related conversations
-        Conversation.query.filter_by(project_id=project_id).delete()
-        
-        # Delete related documents
-        ProjectDocument.query.filter_by(project_id=project_id).delete()
-        
-        # Delete related journal
-        ProjectJournal.query.filter_by(project_id=project_id).delete()
-        
-        # Delete the project itself
-        db.session.delete(project)
-        db.session.commit()
+        if request.args.get('hard') == '1':
+            # Child rows go with it through ON DELETE CASCADE
+            db.session.delete(project)
+            db.session.commit()
+        else:
+            # Hide the project now and purge its rows in the background
+            project.deleted_at = datetime.utcnow()
+            db.session.commit()
+            cleanup_jobs.submit(('purge', project_id), purge_project, project_id)
         return '', 204
 
 @app.route('/api/projects/<int:project_id>/documents', methods=['POST'])
 def create_document(project_id):
-    project = Project.query.get_or_404(project_id)
+    project = get_project_or_404(project_id)
     data = request.json
     new_document = ProjectDocument(
         project_id=project.id,
@@ -195,18 +371,21 @@ def create_document(project_id):
 
 @app.route('/api/projects/<int:project_id>/documents', methods=['GET'])
 def get_documents(project_id):
-    project = Project.query.get_or_404(project_id)
-    documents = ProjectDocument.query.filter_by(project_id=project.id).all()
-    return jsonify([{
-        "id": doc.id,
-        "project_id": doc.project_id,
-        "doc_type": doc.doc_type,
-        "content": doc.content
-    } for doc in documents])
+    project = get_project_or_404(project_id)
+
+    def build():
+        documents = ProjectDocument.query.filter_by(project_id=project.id).options(*ProjectDocument.load_content()).all()
+        return [{
+            "id": doc.id,
+            "project_id": doc.project_id,
+            "doc_type": doc.doc_type,
+            "content": doc.content
+        } for doc in documents]
+    return cached_json(*artifact_validators(project.id, [ProjectDocument]), build)
 
 @app.route('/api/projects/<int:project_id>/conversations', methods=['POST'])
 def create_conversation(project_id):
-    project = Project.query.get_or_404(project_id)
+    project = get_project_or_404(project_id)
     data = request.json
     new_conversation = Conversation(
         project_id=project.id,
@@ -223,38 +402,144 @@ def create_conversation(project_id):
         "timestamp": new_conversation.timestamp.isoformat()
     }), 201
 
+CHAT_AGENT_TYPES = ['user', 'Project Assistant']
+CONVERSATION_PAGE_SIZE = 50
+MAX_CONVERSATION_PAGE_SIZE = 200
+
+def paginate_conversations(query, before_id=None, limit=CONVERSATION_PAGE_SIZE):
+    """Return one page of conversations older than before_id, in chronological order.
+
+    Uses keyset pagination on (timestamp, id) so each page is served from the
+    (project_id, timestamp) index. Also returns the before_id cursor for the
+    next (older) page, or None when there are no older conversations.
+    """
+    limit = max(1, min(limit, MAX_CONVERSATION_PAGE_SIZE))
+    if before_id:
+        cursor = db.session.get(Conversation, before_id)
+        if cursor:
+            query = query.filter(or_(
+                Conversation.timestamp < cursor.timestamp,
+                and_(Conversation.timestamp == cursor.timestamp, Conversation.id < cursor.id)
+            ))
+        else:
+            query = query.filter(Conversation.id < before_id)
+    conversations = (query.options(*Conversation.load_content())
+                     .order_by(Conversation.timestamp.desc(), Conversation.id.desc()).limit(limit + 1).all())
+    has_more = len(conversations) > limit
+    conversations = conversations[:limit][::-1]
+    next_before_id = conversations[0].id if has_more else None
+    return conversations, next_before_id
+
+def paginated_response(items, next_before_id):
+    response = jsonify(items)
+    if next_before_id:
+        response.headers['X-Next-Before-Id'] = str(next_before_id)
+    return response
+
+SEARCH_PAGE_SIZE = 20
+MAX_SEARCH_PAGE_SIZE = 100
+
+@app.route('/api/search', methods=['GET'])
+def search_content():
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({"error": "q is required"}), 400
+    kinds = [kind for kind in request.args.get('types', '').split(',') if kind]
+    invalid_kinds = [kind for kind in kinds if kind not in SEARCH_KINDS]
+    if invalid_kinds:
+        return jsonify({"error": "Invalid types", "invalid_types": invalid_kinds, "types": SEARCH_KINDS}), 400
+    limit = max(1, min(request.args.get('limit', SEARCH_PAGE_SIZE, type=int), MAX_SEARCH_PAGE_SIZE))
+    offset = max(0, request.args.get('offset', 0, type=int))
+
+    try:
+        results = search(query, project_id=request.args.get('project_id', type=int), kinds=kinds,
+                         limit=limit, offset=offset)
+    except OperationalError as e:
+        app.logger.error("Search failed: %s", e)
+        return jsonify({"error": "Search is unavailable"}), 503
+
+    response = jsonify(results[:limit])
+    if len(results) > limit:
+        response.headers['X-Next-Offset'] = str(offset + limit)
+    return response
+
+REVISION_PAGE_SIZE = 50
+MAX_REVISION_PAGE_SIZE = 500
+
+@app.route('/api/projects/<int:project_id>/revisions/<artifact>', methods=['GET'])
+def artifact_revisions(project_id, artifact):
+    project = get_project_or_404(project_id)
+    if artifact not in REVISIONED_ARTIFACTS:
+        return jsonify({"error": "Unknown artifact", "artifacts": list(REVISIONED_ARTIFACTS)}), 404
+    limit = max(1, min(request.args.get('limit', REVISION_PAGE_SIZE, type=int), MAX_REVISION_PAGE_SIZE))
+    offset = max(0, request.args.get('offset', 0, type=int))
+
+    revisions = revision_store.history(project.id, artifact, limit + 1, offset)
+    response = jsonify([{
+        "revision": revision.revision,
+        "size": revision.size,
+        "snapshot": revision.snapshot,
+        "created_at": revision.created_at.isoformat() if revision.created_at else None
+    } for revision in revisions[:limit]])
+    if len(revisions) > limit:
+        response.headers['X-Next-Offset'] = str(offset + limit)
+    return response
+
+@app.route('/api/projects/<int:project_id>/revisions/<artifact>/<int:number>', methods=['GET'])
+def artifact_revision(project_id, artifact, number):
+    project = get_project_or_404(project_id)
+    loaded = revision_store.load(project.id, artifact, number) if artifact in REVISIONED_ARTIFACTS else None
+    if loaded is None:
+        return jsonify({"error": "Revision not found"}), 404
+    revision, content = loaded
+    return jsonify({
+        "artifact": artifact,
+        "revision": revision.revision,
+        "content": content,
+        "created_at": revision.created_at.isoformat() if revision.created_at else None
+    })
+
 @app.route('/api/projects/<int:project_id>/conversations', methods=['GET'])
 def get_conversations(project_id):
-    project = Project.query.get_or_404(project_id)
-    conversations = Conversation.query.filter_by(project_id=project.id).order_by(Conversation.timestamp).all()
-    return jsonify([{
+    project = get_project_or_404(project_id)
+    conversations, next_before_id = paginate_conversations(
+        Conversation.query.filter_by(project_id=project.id),
+        before_id=request.args.get('before_id', type=int),
+        limit=request.args.get('limit', CONVERSATION_PAGE_SIZE, type=int)
+    )
+    return paginated_response([{
         "id": conv.id,
         "project_id": conv.project_id,
         "agent_type": conv.agent_type,
         "content": conv.content,
         "timestamp": conv.timestamp.isoformat()
-    } for conv in conversations])
+    } for conv in conversations], next_before_id)
 
 @app.route('/api/projects/<int:project_id>/chat_history', methods=['GET'])
 def get_chat_history(project_id):
-    app.logger.debug(f"Fetching chat history for project_id: {project_id}")
-    project = Project.query.get_or_404(project_id)
-    conversations = Conversation.query.filter_by(project_id=project.id).order_by(Conversation.timestamp).all()
-    app.logger.debug(f"Found {len(conversations)} conversations for project_id: {project_id}")
-    chat_history = [{
+    app.logger.debug("Fetching chat history for project_id: %s", project_id)
+    project = get_project_or_404(project_id)
+    conversations, next_before_id = paginate_conversations(
+        Conversation.query.filter(Conversation.project_id == project.id, Conversation.agent_type.in_(CHAT_AGENT_TYPES)),
+        before_id=request.args.get('before_id', type=int),
+        limit=request.args.get('limit', CONVERSATION_PAGE_SIZE, type=int)
+    )
+    app.logger.debug("Returning %d chat messages for project_id: %s", len(conversations), project_id)
+    return paginated_response([{
+        "id": conv.id,
         "agent_type": conv.agent_type,
         "content": conv.content
-    } for conv in conversations if conv.agent_type in ['user', 'Project Assistant']]
-    app.logger.debug(f"Returning chat history: {chat_history}")
-    return jsonify(chat_history)
+    } for conv in conversations], next_before_id)
 
 @app.route('/api/projects/<int:project_id>/clear_chat_history', methods=['POST'])
 def clear_chat_history(project_id):
-    app.logger.debug(f"Clearing chat history for project_id: {project_id}")
-    project = Project.query.get_or_404(project_id)
+    app.logger.debug("Clearing chat history for project_id: %s", project_id)
+    project = get_project_or_404(project_id)
     Conversation.query.filter_by(project_id=project.id).delete()
+    # Conversation ids can be reused once the rows are gone, so reset the watermark
+    ProjectJournal.query.filter_by(project_id=project.id).update({"last_conversation_id": None})
     db.session.commit()
-    app.logger.debug(f"Chat history cleared for project_id: {project_id}")
+    app.logger.debug("Chat history cleared for project_id: %s", project_id)
     return jsonify({"message": "Chat history cleared successfully"}), 200
 
 @app.route('/api/ai_providers', methods=['GET', 'POST'])
@@ -271,7 +556,9 @@ def ai_providers():
             provider.api_url = data['api_url']
             if 'api_key' in data:
                 provider.api_key = data['api_key']
+            config_cache.bump()
             db.session.commit()
+            provider_clients.invalidate(provider.id)
         else:
             existing_provider = AIProvider.query.filter_by(name=data['name']).first()
             if existing_provider:
@@ -286,7 +573,9 @@ def ai_providers():
                     api_key=data.get('api_key')
                 )
                 db.session.add(provider)
+            config_cache.bump()
             db.session.commit()
+            provider_clients.invalidate(provider.id)
         return jsonify({"id": provider.id, "name": provider.name, "api_url": provider.api_url, "has_api_key": bool(provider.api_key)}), 200
     else:
         providers = AIProvider.query.all()
@@ -305,11 +594,15 @@ def ai_provider(provider_id):
         provider.api_url = data.get('api_url', provider.api_url)
         if 'api_key' in data:
             provider.api_key = data['api_key']
+        config_cache.bump()
         db.session.commit()
+        provider_clients.invalidate(provider.id)
         return jsonify({"id": provider.id, "name": provider.name, "api_url": provider.api_url}), 200
     elif request.method == 'DELETE':
         db.session.delete(provider)
+        config_cache.bump()
         db.session.commit()
+        provider_clients.invalidate(provider_id)
         return '', 204
 
 @app.route('/api/ai_agent_configs', methods=['GET', 'POST'])
@@ -326,6 +619,7 @@ def ai_agent_configs():
             existing_config.model_name = data['model_name']
             existing_config.system_prompt = data['system_prompt']
             existing_config.temperature = data.get('temperature', 0.95)
+            config_cache.bump()
             db.session.commit()
             config = existing_config
         else:
@@ -337,6 +631,7 @@ def ai_agent_configs():
                 temperature=data.get('temperature', 0.95)
             )
             db.session.add(new_config)
+            config_cache.bump()
             db.session.commit()
             config = new_config
 
@@ -380,6 +675,7 @@ def ai_agent_config(config_id):
         config.model_name = data.get('model_name', config.model_name)
         config.system_prompt = data.get('system_prompt', config.system_prompt)
         config.temperature = data.get('temperature', config.temperature)
+        config_cache.bump()
         db.session.commit()
         return jsonify({
             "id": config.id,
@@ -391,6 +687,7 @@ def ai_agent_config(config_id):
         }), 200  # Explicitly return 200 status code
     elif request.method == 'DELETE':
         db.session.delete(config)
+        config_cache.bump()
         db.session.commit()
         return '', 204
 
@@ -417,6 +714,7 @@ def apply_to_all_agents():
             )
             db.session.add(new_config)
 
+    config_cache.bump()
     db.session.commit()
     return jsonify({"message": "Model applied to all agents successfully!"}), 200
 
@@ -431,6 +729,10 @@ def get_agent_system_prompt(agent_type):
     else:
         return jsonify({"error": "Agent type not found"}), 404
 
+@app.route('/api/response_cache/stats', methods=['GET'])
+def response_cache_stats():
+    return jsonify(response_cache.stats())
+
 @app.route('/api/backup', methods=['GET'])
 def backup_settings():
     providers = AIProvider.query.all()
@@ -447,9 +749,9 @@ def backup_settings():
 def restore_settings():
     data = request.json
     
-    # Clear existing data
-    db.session.query(AIProvider).delete()
+    # Clear existing data (agent configs first, they reference the providers)
     db.session.query(AIAgentConfig).delete()
+    db.session.query(AIProvider).delete()
     
     # Restore providers
     for provider_data in data['providers']:
@@ -461,7 +763,9 @@ def restore_settings():
         config = AIAgentConfig(agent_type=config_data['agent_type'], provider_id=config_data['provider_id'], model_name=config_data['model_name'], system_prompt=config_data['system_prompt'])
         db.session.add(config)
     
+    config_cache.bump()
     db.session.commit()
+    provider_clients.invalidate()
     
     return jsonify({"message": "Settings restored successfully"})
 
@@ -473,134 +777,386 @@ def chat():
         message = data.get('message')
         agent_type = 'Project Assistant'  # Hardcoded for now
 
-        app.logger.info(f"Chat request received. Project ID: {project_id}, Message: {message}")
-
-        # Get the AI agent configuration
-        agent_config = AIAgentConfig.query.filter_by(agent_type=agent_type).first()
-        if not agent_config:
-            app.logger.error("Agent configuration not found")
-            return jsonify({"error": "Agent configuration not found"}), 404
+        app.logger.info("Chat request received", extra={'fields': {'project_id': project_id, 'message': Truncated(message)}})
 
-        app.logger.info(f"Agent configuration found. Provider ID: {agent_config.provider_id}, Model: {agent_config.model_name}, Temperature: {agent_config.temperature}")
+        project, agent_config, provider, chat_message, headers = prepare_chat_request(project_id, message, agent_type)
 
-        # Get the AI provider
-        provider = db.session.get(AIProvider, agent_config.provider_id)
-        if not provider:
-            app.logger.error("AI provider not found")
-            return jsonify({"error": "AI provider not found"}), 404
+        cache_key = None
+        if response_cache.applies(agent_config.temperature, data.get('cache')):
+            cache_key = response_cache.key(provider, chat_message)
+        ai_response = response_cache.get(cache_key) if cache_key else None
 
-        app.logger.info(f"AI provider found. Name: {provider.name}, API URL: {provider.api_url}")
-
-        # Get the API key from the database
-        api_key = provider.api_key
-        if not api_key:
-            app.logger.error(f"API key for {provider.name} not found in the database")
-            return jsonify({"error": f"API key for {provider.name} not configured"}), 500
-
-        # Get the project details
-        project = Project.query.get(project_id)
-        if not project:
-            app.logger.error(f"Project with ID {project_id} not found")
-            return jsonify({"error": "Project not found"}), 404
-
-        # Prepare the chat message
-        project_info = f"Current project: {project.name}\n"
-        if project.description:
-            project_info += f"Description: {project.description}\n"
-        if project.main_features:
-            project_info += f"Main features: {project.main_features}"
+        if ai_response is None:
+            ai_response = request_chat_completion(provider, chat_message, headers, agent_type)
+            if cache_key:
+                response_cache.set(cache_key, ai_response)
+        else:
+            app.logger.info("AI response served from cache")
 
-        chat_message = {
-            "model": agent_config.model_name,
-            "messages": [
-                {"role": "system", "content": agent_config.system_prompt},
-                {"role": "system", "content": project_info},
-                {"role": "user", "content": message}
-            ],
-            "temperature": agent_config.temperature
-        }
+        # Extract requested features from the user message
+        requested_features = re.findall(r'(?:add|include|implement)\s+(?:a|an|the)?\s*(.+?)(?:\s+feature|\s*$)', message, re.IGNORECASE)
+        
+        # Format the AI response for better readability
+        formatted_response = format_ai_response(ai_response, requested_features, project)
 
-        app.logger.info(f"Prepared chat message: {chat_message}")
+        app.logger.info("Formatted AI response: %s", Truncated(formatted_response), extra=SAMPLED_LOG)
 
-        # Send request to the AI provider
-        headers = {
-            "Content-Type": "application/json"
-        }
-        if provider.name.lower() != 'ollama':
-            headers["Authorization"] = f"Bearer {api_key}"
+        save_chat_turn(project_id, message, agent_type, ai_response)
 
-        app.logger.info(f"Sending request to AI provider: {provider.api_url}")
-        
-        if provider.name.lower() == 'ollama':
-            ollama_payload = {
-                "model": agent_config.model_name,
-                "prompt": chat_message['messages'][-1]['content'],
-                "stream": False
-            }
-            response = requests.post(provider.api_url, json=ollama_payload, headers=headers, timeout=30)
-        else:
-            response = requests.post(provider.api_url, json=chat_message, headers=headers, timeout=30)
+        return jsonify({"response": formatted_response, "journal_status": "pending"})
 
-        app.logger.info(f"Response status code: {response.status_code}")
-        response.raise_for_status()  # Raise an exception for non-200 status codes
+    except ChatRequestError as e:
+        return jsonify({"error": e.message}), e.status_code
+    except requests.RequestException as e:
+        app.logger.error("Error communicating with AI provider: %s", e)
+        return jsonify({"error": "Failed to get response from AI provider"}), 500
+    except Exception as e:
+        app.logger.error("Unexpected error in chat function: %s", e, exc_info=True)
+        return jsonify({"error": "An unexpected error occurred"}), 500
 
-        response_text = response.text
-        app.logger.info(f"Raw response text: {response_text}")
+@app.route('/api/chat/stream', methods=['POST'])
+def chat_stream():
+    data = request.json
+    project_id = data.get('project_id')
+    message = data.get('message')
+    agent_type = 'Project Assistant'  # Hardcoded for now
 
-        response_json = response.json()
-        app.logger.info(f"Response JSON: {response_json}")
+    app.logger.info("Streaming chat request received", extra={'fields': {'project_id': project_id, 'message': Truncated(message)}})
 
-        if provider.name.lower() == 'ollama':
-            ai_response = response_json.get('response', '')
+    try:
+        project, agent_config, provider, chat_message, headers = prepare_chat_request(project_id, message, agent_type, stream=True)
+    except ChatRequestError as e:
+        return jsonify({"error": e.message}), e.status_code
+
+    cache_key = None
+    if response_cache.applies(agent_config.temperature, data.get('cache')):
+        cache_key = response_cache.key(provider, chat_message)
+
+    def generate():
+        cached_response = response_cache.get(cache_key) if cache_key else None
+        if cached_response is not None:
+            app.logger.info("AI response served from cache")
+            tokens = [cached_response]
+            yield sse_event({"token": cached_response})
         else:
-            if 'choices' not in response_json or not response_json['choices']:
-                app.logger.error("No choices in response JSON")
-                return jsonify({"error": "Invalid response from AI provider"}), 500
-            ai_response = response_json['choices'][0]['message']['content']
+            tokens = []
+            usage = {}
+            started = time.perf_counter()
+            try:
+                with provider_clients.post(provider, json=chat_message, headers=headers, stream=True) as response:
+                    response.raise_for_status()
+                    for token in iter_response_tokens(provider, response, usage):
+                        tokens.append(token)
+                        yield sse_event({"token": token})
+                metrics.record_llm_call(provider, chat_message.get('model'), agent_type,
+                                        time.perf_counter() - started, usage)
+            except (requests.RequestException, ValueError) as e:
+                app.logger.error("Error streaming from AI provider: %s", e)
+                yield sse_event({"error": "Failed to get response from AI provider"}, event='error')
+                return
+
+        ai_response = ''.join(tokens)
         if not ai_response:
             app.logger.error("Empty AI response")
-            return jsonify({"error": "Empty response from AI provider"}), 500
+            yield sse_event({"error": "Empty response from AI provider"}, event='error')
+            return
+        if cache_key and cached_response is None:
+            response_cache.set(cache_key, ai_response)
 
-        # Extract requested features from the user message
         requested_features = re.findall(r'(?:add|include|implement)\s+(?:a|an|the)?\s*(.+?)(?:\s+feature|\s*$)', message, re.IGNORECASE)
-        
-        # Format the AI response for better readability
         formatted_response = format_ai_response(ai_response, requested_features, project)
 
-        app.logger.info(f"Formatted AI response: {formatted_response}")
-        
-        # Save the user message
-        user_conversation = Conversation(
-            project_id=project_id,
-            agent_type='user',
-            content=message
-        )
-        db.session.add(user_conversation)
-
-        # Save the AI response
-        ai_conversation = Conversation(
-            project_id=project_id,
-            agent_type=agent_type,
-            content=ai_response
-        )
-        db.session.add(ai_conversation)
+        conversation_ids = save_chat_turn(project_id, message, agent_type, ai_response)
+
+        yield sse_event({"response": formatted_response, "journal_status": "pending",
+                         "conversation_ids": conversation_ids}, event='done')
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+EVENT_HEARTBEAT_SECONDS = 15
+
+@app.route('/api/projects/<int:project_id>/events', methods=['GET'])
+def project_events(project_id):
+    """Server-sent events for a project's committed changes.
+
+    Events are conversation (a chat message, with its text), journal
+    (status), artifact (which bundle field changed) and project (name,
+    rating, likes, deleted). A stream starts after Last-Event-ID (or ?after=),
+    else at the newest event, and closes after EVENT_STREAM_SECONDS;
+    EventSource then reconnects and resumes from the last id it saw. A reset
+    event means some of the project's events were pruned before they could be
+    replayed and the client should reload; it carries the newest id, so the
+    stream continues from there.
+
+    Every open stream holds a worker with sync gunicorn workers, so streams
+    are only served when EVENT_STREAMS_ENABLED (see gunicorn_config.py).
+    """
+    if not app.config['EVENT_STREAMS_ENABLED']:
+        return jsonify({"error": "Event streams are disabled"}), 503
+    project = get_project_or_404(project_id)
+    after_id = request.headers.get('Last-Event-ID', type=int)
+    if after_id is None:
+        after_id = request.args.get('after', type=int)
+    if after_id is None:
+        after_id = event_broker.latest_id()
+    subscription = event_broker.subscribe(project.id, after_id)
+
+    def visible(kind, payload):
+        # Only chat messages are pushed, matching the bundle's chat_history
+        return kind != 'conversation' or payload['agent_type'] in CHAT_AGENT_TYPES
+
+    def generate():
+        last_id = after_id
+        try:
+            yield "retry: 1000\n\n"
+            while True:
+                events = event_broker.replay(project_id, last_id)
+                if events is None:
+                    last_id = event_broker.latest_id()
+                    yield sse_event({}, event='reset', event_id=last_id)
+                    break
+                for event_id, kind, payload in events:
+                    last_id = event_id
+                    if visible(kind, payload):
+                        yield sse_event(payload, event=kind, event_id=event_id)
+                if len(events) < event_broker.batch_size:
+                    break
+            # Don't hold a database connection while waiting for events
+            db.session.close()
+
+            deadline = time.monotonic() + app.config['EVENT_STREAM_SECONDS']
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return
+                try:
+                    event_id, kind, payload = subscription.get(timeout=min(remaining, EVENT_HEARTBEAT_SECONDS))
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+                    continue
+                if event_id > last_id:
+                    last_id = event_id
+                    if visible(kind, payload):
+                        yield sse_event(payload, event=kind, event_id=event_id)
+        finally:
+            event_broker.unsubscribe(project_id, subscription)
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.route('/api/export', methods=['GET'])
+def export_data():
+    scope = request.args.get('scope', 'all')
+    if scope not in ('all', 'settings'):
+        return jsonify({"error": "scope must be 'all' or 'settings'"}), 400
+    compress = request.args.get('compress') == 'gzip'
+
+    chunks = export_lines(export_tables(scope), batch_size=app.config['TRANSFER_BATCH_SIZE'])
+    filename = f"ai_project_manager_{scope}_{datetime.utcnow():%Y%m%d%H%M%S}.ndjson"
+    if compress:
+        chunks, mimetype, filename = gzip_chunks(chunks), 'application/gzip', filename + '.gz'
+    else:
+        mimetype = 'application/x-ndjson'
+    return Response(stream_with_context(chunks), mimetype=mimetype,
+                    headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+
+@app.route('/api/import', methods=['POST'])
+def import_data():
+    replace = request.args.get('replace') == '1'
+    resume = request.args.get('resume') == '1'
+    if replace and resume:
+        return jsonify({"error": "replace and resume can't be combined"}), 400
+    stream = request.stream
+    if request.headers.get('Content-Encoding') == 'gzip' or request.mimetype == 'application/gzip':
+        stream = gzip.GzipFile(fileobj=stream, mode='rb')
+    lines = io.TextIOWrapper(io.BufferedReader(stream) if stream is request.stream else stream, encoding='utf-8')
 
-        # Save the conversation without updating project details
+    try:
+        # Default providers seeded on start don't block importing into a fresh install
+        seeded_rows = {'ai_provider': [dict(provider, api_key=None) for provider in DEFAULT_PROVIDERS]}
+        result = import_lines(lines, replace=replace, resume=resume, seeded_rows=seeded_rows,
+                              batch_size=app.config['TRANSFER_BATCH_SIZE'])
+    except ImportConflict as e:
+        db.session.rollback()
+        return jsonify({"error": "The instance already has data. Import with replace=1 to overwrite it, "
+                                 "or resume=1 to continue an interrupted import.", "tables": e.tables}), 409
+    except (ValueError, KeyError, OSError) as e:
+        db.session.rollback()
+        app.logger.error("Import failed: %s", e)
+        return jsonify({"error": f"Invalid export file: {e}"}), 400
+    finally:
+        config_cache.bump()
         db.session.commit()
+        provider_clients.invalidate()
 
-        app.logger.info("Conversation saved to database")
+    return jsonify(dict(result, message="Import completed successfully"))
 
-        # Update the project journal
-        journal_content = update_project_journal(project_id)
+class ChatRequestError(Exception):
+    def __init__(self, message, status_code):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
 
-        return jsonify({"response": formatted_response, "journal_content": journal_content})
+def prepare_chat_request(project_id, message, agent_type, stream=False):
+    # Get the AI agent configuration and its provider
+    agent_config, provider = config_cache.agent(agent_type)
+    if not agent_config:
+        app.logger.error("Agent configuration not found")
+        raise ChatRequestError("Agent configuration not found", 404)
 
-    except requests.RequestException as e:
-        app.logger.error(f"Error communicating with AI provider: {str(e)}")
-        return jsonify({"error": "Failed to get response from AI provider"}), 500
-    except Exception as e:
-        app.logger.error(f"Unexpected error in chat function: {str(e)}", exc_info=True)
-        return jsonify({"error": "An unexpected error occurred"}), 500
+    app.logger.info("Agent configuration found", extra={'fields': {
+        'provider_id': agent_config.provider_id, 'model': agent_config.model_name, 'temperature': agent_config.temperature}})
+
+    if not provider:
+        app.logger.error("AI provider not found")
+        raise ChatRequestError("AI provider not found", 404)
+
+    app.logger.info("AI provider found", extra={'fields': {'provider': provider.name, 'api_url': provider.api_url}})
+
+    # Get the API key from the database
+    api_key = provider.api_key
+    if not api_key:
+        app.logger.error("API key for %s not found in the database", provider.name)
+        raise ChatRequestError(f"API key for {provider.name} not configured", 500)
+
+    # Get the project details
+    project = Project.query.filter_by(id=project_id, deleted_at=None).first()
+    if not project:
+        app.logger.error("Project with ID %s not found", project_id)
+        raise ChatRequestError("Project not found", 404)
+
+    # Prepare the chat message: system prompt, project summary, journal and recent turns within the token budget
+    project_info = project_summary(project)
+    messages, context_stats = context_builder.build(agent_config, project.id, project_info, message)
+    app.logger.info("Chat context assembled", extra={'fields': context_stats})
+
+    chat_message = {
+        "model": agent_config.model_name,
+        "messages": messages,
+        "temperature": agent_config.temperature
+    }
+    if stream:
+        chat_message["stream"] = True
+
+    app.logger.info("Prepared chat message: %s", Truncated(chat_message), extra=SAMPLED_LOG)
+
+    headers = {
+        "Content-Type": "application/json"
+    }
+    if provider.name.lower() == 'ollama':
+        chat_message = {
+            "model": agent_config.model_name,
+            "prompt": render_prompt(messages),
+            "stream": stream
+        }
+    else:
+        headers["Authorization"] = f"Bearer {api_key}"
+
+    # Hand the DB connection back to the pool before the slow provider call, so
+    # concurrent chats (e.g. under gevent workers) don't exhaust the pool
+    db.session.close()
+
+    return project, agent_config, provider, chat_message, headers
+
+def project_summary(project):
+    project_info = f"Current project: {project.name}\n"
+    if project.description:
+        project_info += f"Description: {project.description}\n"
+    if project.main_features:
+        project_info += f"Main features: {project.main_features}"
+    return project_info
+
+def request_chat_completion(provider, chat_message, headers, agent_type):
+    app.logger.info("Sending request to AI provider: %s", provider.api_url)
+    started = time.perf_counter()
+    response = provider_clients.post(provider, json=chat_message, headers=headers)
+
+    app.logger.info("Response status code: %s", response.status_code)
+    response.raise_for_status()  # Raise an exception for non-200 status codes
+
+    response_json = response.json()
+    app.logger.info("Response JSON: %s", Truncated(response_json), extra=SAMPLED_LOG)
+    metrics.record_llm_call(provider, chat_message.get('model'), agent_type,
+                            time.perf_counter() - started, metrics.token_usage(response_json))
+
+    if provider.name.lower() == 'ollama':
+        ai_response = response_json.get('response', '')
+    else:
+        if 'choices' not in response_json or not response_json['choices']:
+            app.logger.error("No choices in response JSON")
+            raise ChatRequestError("Invalid response from AI provider", 500)
+        ai_response = response_json['choices'][0]['message']['content']
+    if not ai_response:
+        app.logger.error("Empty AI response")
+        raise ChatRequestError("Empty response from AI provider", 500)
+    return ai_response
+
+def iter_response_tokens(provider, response, usage=None):
+    # Ollama streams NDJSON objects, OpenAI-style providers stream SSE "data:" lines.
+    # Token counts, when the provider sends them, are stored in usage.
+    if provider.name.lower() == 'ollama':
+        for line in response.iter_lines():
+            if not line:
+                continue
+            chunk = json.loads(line)
+            token = chunk.get('response') or chunk.get('message', {}).get('content', '')
+            if token:
+                yield token
+            if chunk.get('done'):
+                if usage is not None:
+                    usage.update(metrics.token_usage(chunk))
+                break
+    else:
+        # SSE is always UTF-8; without a charset requests would decode it as ISO-8859-1
+        response.encoding = 'utf-8'
+        for line in response.iter_lines(decode_unicode=True):
+            if not line or not line.startswith('data:'):
+                continue
+            data = line[len('data:'):].strip()
+            if data == '[DONE]':
+                break
+            chunk = json.loads(data)
+            if chunk.get('usage') and usage is not None:
+                usage.update(metrics.token_usage(chunk))
+            choices = chunk.get('choices') or []
+            token = choices[0].get('delta', {}).get('content') if choices else None
+            if token:
+                yield token
+
+def sse_event(data, event=None, event_id=None):
+    payload = f"data: {json.dumps(data)}\n\n"
+    if event:
+        payload = f"event: {event}\n" + payload
+    if event_id is not None:
+        payload = f"id: {event_id}\n" + payload
+    return payload
+
+def save_chat_turn(project_id, message, agent_type, ai_response):
+    # Save the user message
+    user_conversation = Conversation(
+        project_id=project_id,
+        agent_type='user',
+        content=message
+    )
+    db.session.add(user_conversation)
+
+    # Save the AI response
+    ai_conversation = Conversation(
+        project_id=project_id,
+        agent_type=agent_type,
+        content=ai_response
+    )
+    db.session.add(ai_conversation)
+
+    # Save the conversation without updating project details
+    db.session.commit()
+
+    app.logger.info("Conversation saved to database")
+
+    # Regenerate the project journal in the background
+    schedule_journal_update(project_id)
+    return [user_conversation.id, ai_conversation.id]
 
 import re
 
@@ -659,7 +1215,8 @@ Format the response as a Python dictionary with keys 'name', 'description', and
             ] + requested_features
         }
 
-def get_ai_response(prompt, agent_config, provider):
+def get_ai_response(prompt, agent_config, provider, use_cache=None, timeout=None):
+    # timeout, if given, replaces the provider (connect, read) timeout for this call
     headers = {
         "Content-Type": "application/json"
     }
@@ -681,40 +1238,83 @@ def get_ai_response(prompt, agent_config, provider):
             "temperature": agent_config.temperature
         }
 
-    response = requests.post(provider.api_url, json=payload, headers=headers, timeout=30)
+    cache_key = None
+    if response_cache.applies(agent_config.temperature, use_cache):
+        cache_key = response_cache.key(provider, payload)
+        cached_response = response_cache.get(cache_key)
+        if cached_response is not None:
+            return cached_response
+
+    started = time.perf_counter()
+    response = provider_clients.post(provider, json=payload, headers=headers, timeout=timeout or provider_clients.timeout)
     response.raise_for_status()
 
     response_json = response.json()
+    metrics.record_llm_call(provider, agent_config.model_name, agent_config.agent_type,
+                            time.perf_counter() - started, metrics.token_usage(response_json))
     
     if provider.name.lower() == 'ollama':
-        return response_json.get('response', '')
+        ai_response = response_json.get('response', '')
     else:
-        return response_json['choices'][0]['message']['content']
+        ai_response = response_json['choices'][0]['message']['content']
+
+    if cache_key and ai_response:
+        response_cache.set(cache_key, ai_response)
+    return ai_response
 
-def update_project_journal(project_id, new_content=None):
-    project = Project.query.get(project_id)
+def update_project_journal(project_id, full_rebuild=False):
+    project = Project.query.filter_by(id=project_id, deleted_at=None).first()
     
     if not project:
         return
 
-    # Get the Project Writer agent configuration
-    agent_config = AIAgentConfig.query.filter_by(agent_type='Project Writer').first()
+    # Get the Project Writer agent configuration and its provider
+    agent_config, provider = config_cache.agent('Project Writer')
     if not agent_config:
         app.logger.error("Project Writer agent configuration not found")
         return
 
-    # Get the AI provider
-    provider = db.session.get(AIProvider, agent_config.provider_id)
     if not provider:
         app.logger.error("AI provider not found for Project Writer")
         return
 
-    # Prepare the conversation history
-    conversations = Conversation.query.filter_by(project_id=project_id).order_by(Conversation.timestamp).all()
+    journal = ProjectJournal.query.filter_by(project_id=project_id).first()
+
+    # Only fold in the turns after the watermark unless a full rebuild is requested
+    incremental = not full_rebuild and journal is not None and journal.content and journal.last_conversation_id is not None
+    conversations = Conversation.query.filter_by(project_id=project_id)
+    if incremental:
+        conversations = conversations.filter(Conversation.id > journal.last_conversation_id)
+    conversations = conversations.options(*Conversation.load_content()).order_by(Conversation.id).all()
+
+    if incremental and not conversations:
+        journal.status = 'fresh'
+        db.session.commit()
+        return journal.content
+
     conversation_history = "\n".join([f"{conv.agent_type}: {conv.content}" for conv in conversations])
 
     # Prepare the prompt for the Project Writer
-    prompt = f"""Analyze the following conversation and extract important information about the project:
+    if incremental:
+        prompt = f"""Here is the current project journal:
+
+{journal.content}
+
+Update the journal with any new information about the project from the following conversation:
+
+{conversation_history}
+
+Keep the summary concise and preserve everything from the current journal that is still accurate, including:
+1. Project name
+2. Description
+3. Main features
+4. Tech stack
+5. Target audience
+6. Any other important details
+
+Format the response as a structured summary."""
+    else:
+        prompt = f"""Analyze the following conversation and extract important information about the project:
     
 {conversation_history}
 
@@ -728,6 +1328,10 @@ Please provide a concise summary of the project, including:
 
 Format the response as a structured summary."""
 
+    watermark = conversations[-1].id if conversations else None
+    # Hand the DB connection back to the pool while the Project Writer is working
+    db.session.close()
+
     # Get the AI response
     ai_response = get_ai_response(prompt, agent_config, provider)
 
@@ -739,17 +1343,91 @@ Format the response as a structured summary."""
     else:
         journal = ProjectJournal(project_id=project_id, content=ai_response)
         db.session.add(journal)
+    if watermark is not None:
+        journal.last_conversation_id = watermark
+    # Turns saved during the AI call are still pending; regenerate_project_journal folds them in next
+    newer = watermark is not None and db.session.query(
+        Conversation.query.filter(Conversation.project_id == project_id, Conversation.id > watermark).exists()).scalar()
+    journal.status = 'pending' if newer else 'fresh'
+    revision_store.record(journal)
     
     db.session.commit()
+    # The previous journal text may now be an unreferenced blob
+    schedule_blob_gc()
     return ai_response
 
+def schedule_journal_update(project_id, full_rebuild=False):
+    # Mark the journal as pending so every worker reports the same status
+    journal = ProjectJournal.query.filter_by(project_id=project_id).first()
+    if not journal:
+        journal = ProjectJournal(project_id=project_id)
+        db.session.add(journal)
+    journal.status = 'pending'
+    db.session.commit()
+
+    job_key = ('journal_rebuild' if full_rebuild else 'journal', project_id)
+    journal_jobs.submit(job_key, regenerate_project_journal, project_id, full_rebuild)
+
+def claim_journal(project_id, claimed):
+    """Take (claimed=True) or release the project's journal claim; returns whether it was taken.
+
+    The claim is a lease in the database, so only one worker process at a time
+    regenerates a journal; a crashed worker's claim expires after
+    JOURNAL_CLAIM_SECONDS. last_updated is left untouched.
+    """
+    now = datetime.utcnow()
+    statement = update(ProjectJournal).where(ProjectJournal.project_id == project_id)
+    if claimed:
+        statement = statement.where(or_(ProjectJournal.claimed_until.is_(None), ProjectJournal.claimed_until < now))
+    until = now + timedelta(seconds=app.config['JOURNAL_CLAIM_SECONDS']) if claimed else None
+    count = db.session.execute(statement.values(claimed_until=until, last_updated=ProjectJournal.last_updated)).rowcount
+    db.session.commit()
+    return count > 0
+
+def regenerate_project_journal(project_id, full_rebuild=False):
+    # A worker that finds the journal claimed leaves its turns to the claim
+    # holder, which keeps going while the journal is still pending
+    while claim_journal(project_id, True):
+        try:
+            try:
+                journal_content = update_project_journal(project_id, full_rebuild=full_rebuild)
+            except Exception:
+                db.session.rollback()
+                app.logger.error("Journal regeneration failed for project_id: %s", project_id, exc_info=True)
+                journal_content = None
+
+            if journal_content is None:
+                journal = ProjectJournal.query.filter_by(project_id=project_id).first()
+                if journal:
+                    journal.status = 'stale'
+                    db.session.commit()
+        finally:
+            claim_journal(project_id, False)
+        if journal_content is None:
+            return
+        full_rebuild = False
+        status = db.session.query(ProjectJournal.status).filter_by(project_id=project_id).scalar()
+        if status != 'pending':
+            return
+
 @app.route('/api/projects/<int:project_id>/journal', methods=['GET'])
 def get_project_journal(project_id):
-    journal = ProjectJournal.query.filter_by(project_id=project_id).first()
-    if journal:
-        return jsonify({"content": journal.content})
-    else:
-        return jsonify({"content": "No journal entries yet."})
+    def build():
+        journal = ProjectJournal.query.filter_by(project_id=project_id).options(*ProjectJournal.load_content()).first()
+        if journal:
+            return {
+                "content": journal.content or "No journal entries yet.",
+                "status": journal.status or 'fresh',
+                "last_updated": journal.last_updated.isoformat() if journal.last_updated else None
+            }
+        return {"content": "No journal entries yet.", "status": "fresh", "last_updated": None}
+    return cached_json(*artifact_validators(project_id, [ProjectJournal]), build)
+
+@app.route('/api/projects/<int:project_id>/journal/rebuild', methods=['POST'])
+def rebuild_project_journal(project_id):
+    project = get_project_or_404(project_id)
+    schedule_journal_update(project.id, full_rebuild=True)
+    return jsonify({"message": "Journal rebuild scheduled", "status": "pending"}), 202
 
 @app.route('/api/projects/<int:project_id>/scope', methods=['GET', 'POST'])
 def project_scope(project_id):
@@ -761,11 +1439,11 @@ def project_scope(project_id):
         else:
             scope = ProjectScope(project_id=project_id, content=content)
             db.session.add(scope)
+        revision_store.record(scope)
         db.session.commit()
         return jsonify({"message": "Project scope updated successfully"})
     else:
-        scope = ProjectScope.query.filter_by(project_id=project_id).first()
-        return jsonify({"content": scope.content if scope else "No scope defined yet."})
+        return single_artifact_response(ProjectScope, project_id)
 
 @app.route('/api/projects/<int:project_id>/hld', methods=['GET', 'POST'])
 def project_hld(project_id):
@@ -777,11 +1455,11 @@ def project_hld(project_id):
         else:
             hld = ProjectHLD(project_id=project_id, content=content)
             db.session.add(hld)
+        revision_store.record(hld)
         db.session.commit()
         return jsonify({"message": "Project HLD updated successfully"})
     else:
-        hld = ProjectHLD.query.filter_by(project_id=project_id).first()
-        return jsonify({"content": hld.content if hld else "No HLD defined yet."})
+        return single_artifact_response(ProjectHLD, project_id)
 
 @app.route('/api/projects/<int:project_id>/lld', methods=['GET', 'POST'])
 def project_lld(project_id):
@@ -797,8 +1475,10 @@ def project_lld(project_id):
         db.session.commit()
         return jsonify({"message": f"Project LLD for {component_name} updated successfully"})
     else:
-        llds = ProjectLLD.query.filter_by(project_id=project_id).all()
-        return jsonify([{"component_name": lld.component_name, "content": lld.content} for lld in llds])
+        def build():
+            llds = ProjectLLD.query.filter_by(project_id=project_id).options(*ProjectLLD.load_content()).all()
+            return [{"component_name": lld.component_name, "content": lld.content} for lld in llds]
+        return cached_json(*artifact_validators(project_id, [ProjectLLD]), build)
 
 @app.route('/api/projects/<int:project_id>/master-lld', methods=['GET', 'POST'])
 def project_master_lld(project_id):
@@ -810,11 +1490,11 @@ def project_master_lld(project_id):
         else:
             master_lld = ProjectMasterLLD(project_id=project_id, content=content)
             db.session.add(master_lld)
+        revision_store.record(master_lld)
         db.session.commit()
         return jsonify({"message": "Project Master LLD updated successfully"})
     else:
-        master_lld = ProjectMasterLLD.query.filter_by(project_id=project_id).first()
-        return jsonify({"content": master_lld.content if master_lld else "No Master LLD defined yet."})
+        return single_artifact_response(ProjectMasterLLD, project_id)
 
 @app.route('/api/projects/<int:project_id>/coding-plan', methods=['GET', 'POST'])
 def project_coding_plan(project_id):
@@ -826,11 +1506,11 @@ def project_coding_plan(project_id):
         else:
             coding_plan = CodingPlan(project_id=project_id, content=content)
             db.session.add(coding_plan)
+        revision_store.record(coding_plan)
         db.session.commit()
         return jsonify({"message": "Coding plan updated successfully"})
     else:
-        coding_plan = CodingPlan.query.filter_by(project_id=project_id).first()
-        return jsonify({"content": coding_plan.content if coding_plan else "No coding plan defined yet."})
+        return single_artifact_response(CodingPlan, project_id)
 
 @app.route('/api/projects/<int:project_id>/unit-tests', methods=['GET', 'POST'])
 def project_unit_tests(project_id):
@@ -846,45 +1526,435 @@ def project_unit_tests(project_id):
         db.session.commit()
         return jsonify({"message": f"Unit tests for {component_name} updated successfully"})
     else:
-        unit_tests = UnitTest.query.filter_by(project_id=project_id).all()
-        return jsonify([{"component_name": test.component_name, "content": test.content} for test in unit_tests])
+        def build():
+            unit_tests = UnitTest.query.filter_by(project_id=project_id).options(*UnitTest.load_content()).all()
+            return [{"component_name": test.component_name, "content": test.content} for test in unit_tests]
+        return cached_json(*artifact_validators(project_id, [UnitTest]), build)
+
+def artifact_validators(project_id, models, *extra):
+    """ETag and Last-Modified for a project's rows of the given models, from one aggregate query.
+
+    Each model contributes its row count and newest last_updated (newest id for
+    conversations, which are never edited), so any insert, update or delete
+    changes the ETag. extra values (e.g. request parameters) are mixed in.
+    """
+    columns = []
+    for model in models:
+        stamp = model.last_updated if hasattr(model, 'last_updated') else model.id
+        columns += [select(func.count(model.id)).where(model.project_id == project_id).scalar_subquery(),
+                    select(func.max(stamp)).where(model.project_id == project_id).scalar_subquery()]
+    values = list(db.session.execute(select(*columns)).one()) if columns else []
+    stamps = [value for value in values + list(extra) if isinstance(value, datetime)]
+    etag = hashlib.sha1(repr([project_id] + values + list(extra)).encode()).hexdigest()
+    return etag, max(stamps) if stamps else None
+
+def single_artifact_response(model, project_id):
+    def build():
+        artifact = model.query.filter_by(project_id=project_id).options(*model.load_content()).first()
+        return {"content": artifact.content if artifact else SINGLE_ARTIFACT_PLACEHOLDERS[model]}
+    return cached_json(*artifact_validators(project_id, [model]), build)
+
+BUNDLE_FIELDS = ['project', 'journal', 'scope', 'hld', 'lld', 'master_lld', 'coding_plan', 'unit_tests', 'chat_history']
+
+# Artifacts with a single row per project, and the placeholder used when it is missing
+SINGLE_ARTIFACTS = {
+    'scope': (ProjectScope, "No scope defined yet."),
+    'hld': (ProjectHLD, "No HLD defined yet."),
+    'master_lld': (ProjectMasterLLD, "No Master LLD defined yet."),
+    'coding_plan': (CodingPlan, "No coding plan defined yet.")
+}
+SINGLE_ARTIFACT_PLACEHOLDERS = dict(SINGLE_ARTIFACTS.values())
+BUNDLE_FIELD_MODELS = dict({field: model for field, (model, _) in SINGLE_ARTIFACTS.items()},
+                           journal=ProjectJournal, lld=ProjectLLD, unit_tests=UnitTest, chat_history=Conversation)
+
+@app.route('/api/projects/<int:project_id>/bundle', methods=['GET'])
+def project_bundle(project_id):
+    project = get_project_or_404(project_id)
+
+    fields = request.args.get('fields')
+    fields = [field.strip() for field in fields.split(',') if field.strip()] if fields else BUNDLE_FIELDS
+    unknown_fields = set(fields) - set(BUNDLE_FIELDS)
+    if unknown_fields:
+        return jsonify({"error": f"Unknown fields: {', '.join(sorted(unknown_fields))}"}), 400
+
+    def build():
+        bundle = {}
+        if 'project' in fields:
+            bundle['project'] = {
+                "id": project.id,
+                "name": project.name,
+                "description": project.description,
+                "main_features": project.main_features.split(', ') if project.main_features else [],
+                "ai_agents": json.loads(project.ai_agents) if project.ai_agents else [],
+                "average_rating": project.average_rating,
+                "likes_count": project.likes_count or 0
+            }
+        if 'journal' in fields:
+            journal = ProjectJournal.query.filter_by(project_id=project_id).options(*ProjectJournal.load_content()).first()
+            bundle['journal'] = {
+                "content": journal.content if journal and journal.content else "No journal entries yet.",
+                "status": (journal.status or 'fresh') if journal else 'fresh',
+                "last_updated": journal.last_updated.isoformat() if journal and journal.last_updated else None
+            }
+        for field, (model, placeholder) in SINGLE_ARTIFACTS.items():
+            if field in fields:
+                artifact = model.query.filter_by(project_id=project_id).options(*model.load_content()).first()
+                bundle[field] = {"content": artifact.content if artifact else placeholder}
+        if 'lld' in fields:
+            llds = ProjectLLD.query.filter_by(project_id=project_id).options(*ProjectLLD.load_content()).all()
+            bundle['lld'] = [{"component_name": lld.component_name, "content": lld.content} for lld in llds]
+        if 'unit_tests' in fields:
+            unit_tests = UnitTest.query.filter_by(project_id=project_id).options(*UnitTest.load_content()).all()
+            bundle['unit_tests'] = [{"component_name": test.component_name, "content": test.content} for test in unit_tests]
+        if 'chat_history' in fields:
+            # Only the latest page; older messages are loaded from /chat_history?before_id=
+            conversations, next_before_id = paginate_conversations(
+                Conversation.query.filter(Conversation.project_id == project_id, Conversation.agent_type.in_(CHAT_AGENT_TYPES))
+            )
+            bundle['chat_history'] = [{"id": conv.id, "agent_type": conv.agent_type, "content": conv.content} for conv in conversations]
+            bundle['chat_history_next_before_id'] = next_before_id
+
+        return bundle
+
+    validators = artifact_validators(project.id, [BUNDLE_FIELD_MODELS[field] for field in fields if field in BUNDLE_FIELD_MODELS],
+                                     ','.join(fields), project.last_updated if 'project' in fields else None)
+    return cached_json(*validators, build)
+
+@app.route('/api/projects/<int:project_id>/consult', methods=['POST'])
+def consult_agents(project_id):
+    project = get_project_or_404(project_id)
+    data = request.json
+    message = data.get('message')
+    agent_types = data.get('agent_types') or []
+    if not message:
+        return jsonify({"error": "Message is required"}), 400
+    invalid_agent_types = [agent_type for agent_type in agent_types if agent_type not in AGENT_TYPES]
+    if not agent_types or invalid_agent_types:
+        return jsonify({"error": "Invalid agent types", "invalid_agent_types": invalid_agent_types}), 400
+    try:
+        timeout = float(data.get('timeout', app.config['CONSULT_TIMEOUT']))
+    except (TypeError, ValueError):
+        timeout = None
+    if timeout is None or not timeout > 0:
+        return jsonify({"error": "Invalid timeout. Must be a positive number of seconds."}), 400
+    deadline = min(timeout, app.config['CONSULT_TIMEOUT'])
+
+    results = {}
+    agents = {}
+    for agent_type in dict.fromkeys(agent_types):
+        agent_config, provider = config_cache.agent(agent_type)
+        if provider:
+            agents[agent_type] = (agent_config, provider)
+    for agent_type in agent_types:
+        if agent_type not in agents:
+            results[agent_type] = {"agent_type": agent_type, "status": "error", "error": "Agent configuration not found"}
+
+    prompt = f"{project_summary(project)}\n\n{message}"
+    # Hand the DB connection back to the pool while the agents are working
+    db.session.close()
+
+    # Calls are bounded by what is left of the deadline, so an agent that times
+    # out also gives its consult_executor thread back instead of holding it
+    # until the provider's own read timeout
+    expires = time.monotonic() + deadline
+
+    def ask_agent(agent_config, provider):
+        remaining = expires - time.monotonic()
+        if remaining <= 0:
+            raise TimeoutError("Consult deadline passed before the agent started")
+        with app.app_context():
+            return get_ai_response(prompt, agent_config, provider,
+                                   timeout=(min(app.config['PROVIDER_CONNECT_TIMEOUT'], remaining), remaining))
+
+    futures = {consult_executor.submit(ask_agent, *agents[agent_type]): agent_type
+               for agent_type in dict.fromkeys(agent_types) if agent_type in agents}
+    done, not_done = wait(futures, timeout=deadline)
+
+    for future in not_done:
+        future.cancel()
+        agent_type = futures[future]
+        results[agent_type] = {"agent_type": agent_type, "status": "timeout", "error": "Agent did not respond before the deadline"}
+
+    db.session.add(Conversation(project_id=project_id, agent_type='user', content=message))
+    for future in done:
+        agent_type = futures[future]
+        try:
+            ai_response = future.result()
+        except Exception as e:
+            app.logger.error("Consulting %s failed: %s", agent_type, e)
+            results[agent_type] = {"agent_type": agent_type, "status": "error", "error": "Failed to get response from AI provider"}
+            continue
+        results[agent_type] = {"agent_type": agent_type, "status": "ok", "response": ai_response}
+        db.session.add(Conversation(project_id=project_id, agent_type=agent_type, content=ai_response))
+    db.session.commit()
+
+    schedule_journal_update(project_id)
+
+    return jsonify({
+        "results": [results[agent_type] for agent_type in dict.fromkeys(agent_types)],
+        "complete": all(result["status"] == "ok" for result in results.values()),
+        "journal_status": "pending"
+    })
+
+PIPELINE_STAGES = ['scope', 'hld', 'lld', 'master_lld', 'coding_plan', 'unit_tests']
+MAX_PIPELINE_COMPONENTS = 20
+
+class PipelineError(Exception):
+    pass
+
+@app.route('/api/projects/<int:project_id>/pipeline', methods=['POST'])
+def start_document_pipeline(project_id):
+    project = get_project_or_404(project_id)
+    force = bool((request.get_json(silent=True) or {}).get('force'))
+
+    fail_stale_pipeline_jobs(project.id)
+    job = PipelineJob.query.filter(PipelineJob.project_id == project.id,
+                                   PipelineJob.status.in_(['queued', 'running'])).first()
+    if not job:
+        job = PipelineJob(project_id=project.id, status='queued', progress=[])
+        db.session.add(job)
+        db.session.commit()
+        pipeline_jobs.submit(('pipeline', project.id), run_document_pipeline, job.id, force)
+    return jsonify(pipeline_job_to_dict(job)), 202
+
+def fail_stale_pipeline_jobs(project_id=None):
+    """Mark queued or running jobs that stopped making progress as failed.
+
+    A job left behind by a restart or a crashed worker would otherwise block
+    new pipeline runs for its project forever. Running jobs commit after every
+    artifact, so a job untouched for PIPELINE_STALE_SECONDS is no longer running.
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=app.config['PIPELINE_STALE_SECONDS'])
+    stale = update(PipelineJob).where(PipelineJob.status.in_(['queued', 'running']), PipelineJob.last_updated < cutoff)
+    if project_id is not None:
+        stale = stale.where(PipelineJob.project_id == project_id)
+    count = db.session.execute(stale.values(status='failed', error="Pipeline was interrupted")).rowcount
+    db.session.commit()
+    if count:
+        app.logger.warning("Marked %d interrupted pipeline jobs as failed", count)
+
+@app.route('/api/pipeline_jobs/<int:job_id>', methods=['GET'])
+def get_pipeline_job(job_id):
+    job = PipelineJob.query.get_or_404(job_id)
+    return jsonify(pipeline_job_to_dict(job))
+
+def pipeline_job_to_dict(job):
+    return {
+        "id": job.id,
+        "project_id": job.project_id,
+        "status": job.status,
+        "current_stage": job.current_stage,
+        "stages": PIPELINE_STAGES,
+        "progress": job.progress or [],
+        "error": job.error,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "last_updated": job.last_updated.isoformat() if job.last_updated else None
+    }
+
+def run_document_pipeline(job_id, force=False):
+    # Claim the job, unless it was given up on as stale while it waited in the queue
+    claimed = db.session.execute(update(PipelineJob).where(PipelineJob.id == job_id, PipelineJob.status == 'queued')
+                                 .values(status='running')).rowcount
+    db.session.commit()
+    if not claimed:
+        return
+    job = db.session.get(PipelineJob, job_id)
+
+    try:
+        project = db.session.get(Project, job.project_id)
+        writer = pipeline_agent('Project Writer')
+        architect = pipeline_agent('Project Software Architect')
+        coder = pipeline_agent('Project Coder')
+        tester = pipeline_agent('Project Tester')
+
+        journal = ProjectJournal.query.filter_by(project_id=project.id).first()
+        journal_content = journal.content if journal and journal.content else "No journal entries yet."
+
+        scope = generate_artifacts(job, 'scope', ProjectScope, writer, {None: f"""Write the Project Scope document for the following project.
+
+{project_summary(project)}
+
+Project journal:
+{journal_content}
+
+Cover goals, in-scope and out-of-scope features, users, constraints and assumptions."""}, force)[None]
+
+        hld = generate_artifacts(job, 'hld', ProjectHLD, architect, {None: f"""Write the High-Level Design (HLD) for the project described by this scope:
+
+{scope}
+
+End the document with a section titled "Components" that lists each software component on its own line, starting with "- "."""}, force)[None]
+
+        components = parse_components(hld)
+        llds = generate_artifacts(job, 'lld', ProjectLLD, architect, {
+            component: f"""Write the Low-Level Design (LLD) for the "{component}" component of this High-Level Design:
+
+{hld}"""
+            for component in components
+        }, force)
+
+        all_llds = "\n\n".join(f"## {component}\n{llds[component]}" for component in components)
+        master_lld = generate_artifacts(job, 'master_lld', ProjectMasterLLD, writer, {None: f"""Combine the following component Low-Level Designs into a single Master LLD document, resolving overlaps and inconsistencies:
+
+{all_llds}"""}, force)[None]
+
+        generate_artifacts(job, 'coding_plan', CodingPlan, coder, {None: f"""Create a step-by-step coding plan from this Master LLD:
+
+{master_lld}"""}, force)
+
+        generate_artifacts(job, 'unit_tests', UnitTest, tester, {
+            component: f"""Define unit tests for the "{component}" component based on its Low-Level Design:
+
+{llds[component]}"""
+            for component in components
+        }, force)
+
+        job.status = 'completed'
+        job.current_stage = None
+    except Exception as e:
+        db.session.rollback()
+        app.logger.error("Document pipeline %s failed", job_id, exc_info=True)
+        job = db.session.get(PipelineJob, job_id)
+        job.status = 'failed'
+        job.error = str(e) if isinstance(e, PipelineError) else "Failed to generate project documents"
+    db.session.commit()
+
+def pipeline_agent(agent_type):
+    agent_config, provider = config_cache.agent(agent_type)
+    if not agent_config:
+        raise PipelineError(f"{agent_type} agent configuration not found")
+    if not provider:
+        raise PipelineError(f"AI provider not found for {agent_type}")
+    return agent_config, provider
+
+def parse_components(hld):
+    # Bullet or numbered lines after the "Components" heading, up to the next heading
+    section = re.split(r'^\W*components\W*$', hld, maxsplit=1, flags=re.IGNORECASE | re.MULTILINE)
+    components = []
+    if len(section) == 2:
+        for line in section[1].splitlines():
+            if line.startswith('#'):
+                break
+            match = re.match(r'^\s*(?:[-*•]|\d+[.)])\s+(.+?)\s*$', line)
+            if match:
+                name = match.group(1).strip('*_` ').split(':')[0].strip()[:100]
+                if name and name not in components:
+                    components.append(name)
+    return components[:MAX_PIPELINE_COMPONENTS] or ['Core']
+
+def generate_artifacts(job, stage, model, agent, prompts, force=False):
+    """Generate one artifact per prompt (keyed by component name, or None for single documents).
+
+    Artifacts whose prompt and agent settings hash to the stored input_hash are
+    reused instead of regenerated. The rest are generated in parallel.
+    """
+    agent_config, provider = agent
+    job.current_stage = stage
+    db.session.commit()
+
+    results = {}
+    pending = {}
+    for component_name, prompt in prompts.items():
+        input_hash = hashlib.sha256(json.dumps(
+            [agent_config.model_name, agent_config.system_prompt, agent_config.temperature, prompt]
+        ).encode('utf-8')).hexdigest()
+        artifact = pipeline_artifact(model, job.project_id, component_name)
+        if not force and artifact and artifact.content and artifact.input_hash == input_hash:
+            results[component_name] = artifact.content
+            record_pipeline_progress(job, stage, component_name, 'skipped')
+        else:
+            pending[component_name] = input_hash
+
+    def generate(prompt):
+        with app.app_context():
+            # A forced run should not be served the previous answers from the response cache
+            return get_ai_response(prompt, agent_config, provider, use_cache=False if force else None)
+
+    futures = {pipeline_executor.submit(generate, prompts[component_name]): component_name
+               for component_name in pending}
+    for future in as_completed(futures):
+        component_name = futures[future]
+        content = future.result()
+        artifact = pipeline_artifact(model, job.project_id, component_name)
+        if not artifact:
+            artifact = model(project_id=job.project_id)
+            if component_name is not None:
+                artifact.component_name = component_name
+            db.session.add(artifact)
+        artifact.content = content
+        artifact.input_hash = pending[component_name]
+        revision_store.record(artifact)
+        results[component_name] = content
+        record_pipeline_progress(job, stage, component_name, 'generated')
+    return results
+
+def pipeline_artifact(model, project_id, component_name):
+    query = model.query.filter_by(project_id=project_id)
+    if component_name is not None:
+        query = query.filter_by(component_name=component_name)
+    return query.first()
+
+def record_pipeline_progress(job, stage, component_name, status):
+    # Reassign the JSON list so the change is detected and flushed
+    job.progress = (job.progress or []) + [{"stage": stage, "component_name": component_name, "status": status}]
+    db.session.commit()
 
 @app.route('/api/projects/<int:project_id>/rate', methods=['POST'])
 def rate_project(project_id):
-    project = Project.query.get_or_404(project_id)
     rating = request.json.get('rating')
     if rating is None or not isinstance(rating, int) or rating < 1 or rating > 5:
         return jsonify({"error": "Invalid rating. Must be an integer between 1 and 5."}), 400
-    
-    project.rating_sum = (project.rating_sum or 0) + rating
-    project.rating_count = (project.rating_count or 0) + 1
-    project.average_rating = project.rating_sum / project.rating_count
+
+    # One UPDATE so concurrent ratings can't overwrite each other. The
+    # right-hand sides all read the pre-update values.
+    rating_sum = func.coalesce(Project.rating_sum, 0) + rating
+    rating_count = func.coalesce(Project.rating_count, 0) + 1
+    average_rating = db.session.execute(
+        update(Project).where(Project.id == project_id, Project.deleted_at.is_(None))
+        .values(rating_sum=rating_sum, rating_count=rating_count, average_rating=rating_sum * 1.0 / rating_count)
+        .returning(Project.average_rating)
+    ).scalar()
+    if average_rating is None:
+        db.session.rollback()
+        return jsonify({"error": "Project not found"}), 404
     db.session.commit()
     
     return jsonify({
         "message": "Project rated successfully",
-        "new_average_rating": project.average_rating
+        "new_average_rating": average_rating
     })
 
 @app.route('/api/projects/<int:project_id>/like', methods=['POST'])
 def like_project(project_id):
-    project = Project.query.get_or_404(project_id)
+    get_project_or_404(project_id)
     user_id = request.json.get('user_id')  # In a real app, you'd get this from the authenticated user
     if not user_id:
         return jsonify({"error": "User ID is required"}), 400
-    
-    if user_id in project.likes:
-        project.likes.remove(user_id)
-        message = "Project unliked successfully"
-    else:
-        project.likes.append(user_id)
-        message = "Project liked successfully"
-    
+    user_id = str(user_id)
+
+    # Toggle: remove an existing like, otherwise add one. The counter moves in
+    # the same transaction as the like row, with a single atomic UPDATE.
+    unliked = ProjectLike.query.filter_by(project_id=project_id, user_id=user_id).delete()
+    if not unliked:
+        db.session.add(ProjectLike(project_id=project_id, user_id=user_id))
+        try:
+            db.session.flush()
+        except IntegrityError:
+            # A concurrent request from the same user liked it first
+            db.session.rollback()
+            likes_count = db.session.query(Project.likes_count).filter_by(id=project_id).scalar()
+            return jsonify({"message": "Project liked successfully", "likes_count": likes_count or 0})
+
+    likes_count = db.session.execute(
+        update(Project).where(Project.id == project_id)
+        .values(likes_count=func.coalesce(Project.likes_count, 0) + (-1 if unliked else 1))
+        .returning(Project.likes_count)
+    ).scalar()
     db.session.commit()
     
     return jsonify({
-        "message": message,
-        "likes_count": len(project.likes)
+        "message": "Project unliked successfully" if unliked else "Project liked successfully",
+        "likes_count": likes_count
     })
 
 if __name__ == '__main__':
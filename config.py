@@ -6,6 +6,123 @@ class Config:
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or \
         'sqlite:///app.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', 10)),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 20)),
+        'pool_timeout': int(os.environ.get('DB_POOL_TIMEOUT', 30)),
+    }
+
+    # Applied to every new SQLite connection. WAL lets readers and a writer work
+    # concurrently across gunicorn workers; busy_timeout (ms) waits for locks
+    # instead of failing; negative cache_size is in KiB. foreign_keys enables
+    # the ON DELETE CASCADE actions on project child tables.
+    SQLITE_PRAGMAS = {
+        'foreign_keys': 'ON',
+        'journal_mode': os.environ.get('SQLITE_JOURNAL_MODE', 'WAL'),
+        'synchronous': os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL'),
+        'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT', 5000)),
+        'mmap_size': int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),
+        'cache_size': int(os.environ.get('SQLITE_CACHE_SIZE', -64000)),
+    }
+
+    # Background worker threads per process for journal regeneration. One
+    # process at a time regenerates a project's journal, holding a lease for
+    # at most JOURNAL_CLAIM_SECONDS (longer than any AI call)
+    JOURNAL_WORKERS = int(os.environ.get('JOURNAL_WORKERS', 2))
+    JOURNAL_CLAIM_SECONDS = int(os.environ.get('JOURNAL_CLAIM_SECONDS', 300))
+
+    # Outbound AI provider connections (pooled per provider in each worker)
+    PROVIDER_POOL_SIZE = int(os.environ.get('PROVIDER_POOL_SIZE', 10))
+    PROVIDER_KEEP_ALIVE = os.environ.get('PROVIDER_KEEP_ALIVE', 'true').lower() == 'true'
+    PROVIDER_CONNECT_TIMEOUT = float(os.environ.get('PROVIDER_CONNECT_TIMEOUT', 5))
+    PROVIDER_READ_TIMEOUT = float(os.environ.get('PROVIDER_READ_TIMEOUT', 30))
+    PROVIDER_MAX_RETRIES = int(os.environ.get('PROVIDER_MAX_RETRIES', 3))
+    PROVIDER_RETRY_BACKOFF = float(os.environ.get('PROVIDER_RETRY_BACKOFF', 0.5))
+
+    # Shared on-disk cache for low-temperature AI responses (defaults to instance/response_cache.db)
+    RESPONSE_CACHE_ENABLED = os.environ.get('RESPONSE_CACHE_ENABLED', 'true').lower() == 'true'
+    RESPONSE_CACHE_PATH = os.environ.get('RESPONSE_CACHE_PATH')
+    RESPONSE_CACHE_TTL = int(os.environ.get('RESPONSE_CACHE_TTL', 86400))
+    RESPONSE_CACHE_MAX_ENTRIES = int(os.environ.get('RESPONSE_CACHE_MAX_ENTRIES', 10000))
+    RESPONSE_CACHE_MAX_TEMPERATURE = float(os.environ.get('RESPONSE_CACHE_MAX_TEMPERATURE', 0.2))
+    
+    # Per-worker cache of agent configs and providers. Workers re-read the
+    # shared version stamp at most every CHECK_INTERVAL seconds; entries are
+    # also dropped after TTL seconds regardless.
+    CONFIG_CACHE_TTL = float(os.environ.get('CONFIG_CACHE_TTL', 300))
+    CONFIG_CACHE_CHECK_INTERVAL = float(os.environ.get('CONFIG_CACHE_CHECK_INTERVAL', 1))
+
+    # Chat prompt assembly. Budgets are in estimated tokens; per-model budgets
+    # are given as "model=tokens,model-prefix=tokens" and matched by longest prefix.
+    CONTEXT_TOKEN_BUDGET = int(os.environ.get('CONTEXT_TOKEN_BUDGET', 4096))
+    CONTEXT_MODEL_TOKEN_BUDGETS = {
+        model.strip(): int(tokens)
+        for model, _, tokens in (item.partition('=') for item in os.environ.get('CONTEXT_MODEL_TOKEN_BUDGETS', '').split(',') if '=' in item)
+    }
+    CONTEXT_RESPONSE_TOKENS = int(os.environ.get('CONTEXT_RESPONSE_TOKENS', 1024))
+    CONTEXT_MEMORY_SHARE = float(os.environ.get('CONTEXT_MEMORY_SHARE', 0.25))
+    CONTEXT_MAX_TURNS = int(os.environ.get('CONTEXT_MAX_TURNS', 40))
+
+    # Multi-agent consultation: thread pool shared by a worker, and the
+    # longest a request may wait for its agents (seconds)
+    CONSULT_WORKERS = int(os.environ.get('CONSULT_WORKERS', 8))
+    CONSULT_TIMEOUT = float(os.environ.get('CONSULT_TIMEOUT', 25))
+
+    # Document pipeline: concurrent pipeline runs per worker, and parallel
+    # agent calls when fanning out per-component LLDs and unit tests. A queued
+    # or running job not updated for PIPELINE_STALE_SECONDS (left by a restart
+    # or a crashed worker) is marked failed so the project can run a new one
+    PIPELINE_WORKERS = int(os.environ.get('PIPELINE_WORKERS', 1))
+    PIPELINE_FANOUT = int(os.environ.get('PIPELINE_FANOUT', 4))
+    PIPELINE_STALE_SECONDS = int(os.environ.get('PIPELINE_STALE_SECONDS', 900))
+
+    # Soft-deleted projects are purged in the background, BATCH_SIZE rows per
+    # transaction with a short pause between batches to let other writers in
+    CLEANUP_BATCH_SIZE = int(os.environ.get('CLEANUP_BATCH_SIZE', 500))
+    CLEANUP_BATCH_PAUSE = float(os.environ.get('CLEANUP_BATCH_PAUSE', 0.05))
+
+    # Artifact, journal and chat text of at least BLOB_MIN_SIZE characters is
+    # stored once per distinct body in content_blob, compressed with
+    # BLOB_COMPRESSION (zlib, or zstd when the zstandard package is installed).
+    # Blobs nothing refers to any more are removed at most every BLOB_GC_INTERVAL seconds
+    BLOB_MIN_SIZE = int(os.environ.get('BLOB_MIN_SIZE', 1024))
+    BLOB_COMPRESSION = os.environ.get('BLOB_COMPRESSION', 'zlib')
+    BLOB_GC_INTERVAL = int(os.environ.get('BLOB_GC_INTERVAL', 600))
+
+    # Scope, HLD, master LLD, coding plan and journal saves are kept as
+    # revisions: line deltas, with a full snapshot every REVISION_SNAPSHOT_INTERVAL
+    REVISION_SNAPSHOT_INTERVAL = int(os.environ.get('REVISION_SNAPSHOT_INTERVAL', 50))
+
+    # Responses of at least COMPRESS_MIN_SIZE bytes are sent with brotli (if the
+    # brotli package is installed) or gzip. Static URLs carry a content hash and
+    # are cached by browsers for STATIC_MAX_AGE seconds
+    COMPRESS_MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE', 1024))
+    COMPRESS_LEVEL = int(os.environ.get('COMPRESS_LEVEL', 6))
+    COMPRESS_BROTLI_QUALITY = int(os.environ.get('COMPRESS_BROTLI_QUALITY', 5))
+    STATIC_MAX_AGE = int(os.environ.get('STATIC_MAX_AGE', 31536000))
+
+    # Per-project event streams (/api/projects/<id>/events). Each worker polls the
+    # change log every EVENT_POLL_INTERVAL seconds while a stream is open, and
+    # events are kept for EVENT_RETENTION seconds so reconnecting clients can
+    # catch up; older ones are pruned at most every EVENT_PRUNE_INTERVAL seconds.
+    # A stream closes after EVENT_STREAM_SECONDS, under the gunicorn timeout. An
+    # open stream would pin a whole sync worker, so gunicorn_config.py turns
+    # streams off unless the worker class is gevent; the change log is then not
+    # recorded and the browser polls the journal instead.
+    EVENT_STREAMS_ENABLED = os.environ.get('EVENT_STREAMS_ENABLED', 'true').lower() == 'true'
+    EVENT_POLL_INTERVAL = float(os.environ.get('EVENT_POLL_INTERVAL', 0.5))
+    EVENT_RETENTION = int(os.environ.get('EVENT_RETENTION', 3600))
+    EVENT_PRUNE_INTERVAL = int(os.environ.get('EVENT_PRUNE_INTERVAL', 300))
+    EVENT_STREAM_SECONDS = int(os.environ.get('EVENT_STREAM_SECONDS', 25))
+
+    # Rows per streamed chunk on export and per committed batch on import
+    TRANSFER_BATCH_SIZE = int(os.environ.get('TRANSFER_BATCH_SIZE', 1000))
+
+    # Logging: bodies (prompts, payloads, responses) are cut to LOG_MAX_BODY_CHARS
+    # and high-volume lines are kept with probability LOG_SAMPLE_RATE
+    LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+    LOG_MAX_BODY_CHARS = int(os.environ.get('LOG_MAX_BODY_CHARS', 500))
+    LOG_SAMPLE_RATE = float(os.environ.get('LOG_SAMPLE_RATE', 0.1))
     
     # Encryption key for API keys
     ENCRYPTION_KEY = os.environ.get('ENCRYPTION_KEY') or Fernet.generate_key()
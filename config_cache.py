@@ -0,0 +1,85 @@
+import threading
+import time
+from collections import namedtuple
+
+from models import db, AIAgentConfig, AIProvider, ConfigVersion
+
+AgentSettings = namedtuple('AgentSettings', ['id', 'agent_type', 'provider_id', 'model_name', 'system_prompt', 'temperature'])
+ProviderSettings = namedtuple('ProviderSettings', ['id', 'name', 'api_url', 'api_key'])
+
+
+class ConfigCache:
+    """Per-worker cache of AIAgentConfig/AIProvider lookups for the chat hot path.
+
+    Entries are immutable snapshots, so they can be shared between threads and
+    outlive the session that loaded them. Every writer of providers or agent
+    configs calls bump() in its transaction, which increments the single
+    ConfigVersion row. Each worker compares that stamp at most once per
+    check_interval and drops all entries when it has moved. Entries also expire
+    after ttl seconds as a backstop.
+    """
+
+    VERSION_ROW_ID = 1
+
+    def __init__(self, ttl=300, check_interval=1):
+        self.ttl = ttl
+        self.check_interval = check_interval
+        self._agents = {}
+        self._version = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(ttl=config['CONFIG_CACHE_TTL'], check_interval=config['CONFIG_CACHE_CHECK_INTERVAL'])
+
+    def agent(self, agent_type):
+        """Return (AgentSettings, ProviderSettings) for agent_type.
+
+        Either item is None when the agent config or its provider doesn't exist.
+        Missing configs are not cached.
+        """
+        self._check_version()
+        now = time.monotonic()
+        with self._lock:
+            entry = self._agents.get(agent_type)
+        if entry and entry[0] > now:
+            return entry[1]
+
+        agent_config = AIAgentConfig.query.filter_by(agent_type=agent_type).first()
+        if not agent_config:
+            return None, None
+        provider = db.session.get(AIProvider, agent_config.provider_id)
+        settings = (
+            AgentSettings(agent_config.id, agent_config.agent_type, agent_config.provider_id,
+                          agent_config.model_name, agent_config.system_prompt, agent_config.temperature),
+            ProviderSettings(provider.id, provider.name, provider.api_url, provider.api_key) if provider else None,
+        )
+        if provider:
+            with self._lock:
+                self._agents[agent_type] = (now + self.ttl, settings)
+        return settings
+
+    def bump(self):
+        """Mark all cached settings stale in every worker. Commits with the caller's transaction."""
+        updated = ConfigVersion.query.filter_by(id=self.VERSION_ROW_ID).update(
+            {ConfigVersion.version: ConfigVersion.version + 1}, synchronize_session=False)
+        if not updated:
+            db.session.add(ConfigVersion(id=self.VERSION_ROW_ID, version=1))
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self._agents.clear()
+            self._checked_at = 0.0
+
+    def _check_version(self):
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return
+        version = db.session.query(ConfigVersion.version).filter_by(id=self.VERSION_ROW_ID).scalar()
+        with self._lock:
+            if version != self._version:
+                self._agents.clear()
+                self._version = version
+            self._checked_at = now
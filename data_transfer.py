@@ -0,0 +1,173 @@
+import base64
+import json
+import zlib
+from datetime import datetime
+
+from sqlalchemy import DateTime, LargeBinary, and_, false, insert, or_, select
+
+from models import db
+
+EXPORT_FORMAT = 'ai-project-manager-export'
+EXPORT_VERSION = 1
+SETTINGS_TABLES = ('ai_provider', 'ai_agent_config')
+# Per-instance bookkeeping that is never moved between hosts
+EXCLUDED_TABLES = ('config_version', 'pipeline_job', 'project_event')
+
+
+class ImportConflict(Exception):
+    """The import would merge into tables that already hold rows."""
+
+    def __init__(self, tables):
+        super().__init__(f"Tables already contain data: {', '.join(tables)}")
+        self.tables = tables
+
+
+def export_tables(scope='all'):
+    """Tables to export, parents before children."""
+    tables = [table for table in db.metadata.sorted_tables if table.name not in EXCLUDED_TABLES]
+    if scope == 'settings':
+        tables = [table for table in tables if table.name in SETTINGS_TABLES]
+    return tables
+
+
+def export_lines(tables, batch_size=1000):
+    """Yield an NDJSON export of tables as text chunks of roughly batch_size rows.
+
+    The first line is a header naming the tables; every other line is
+    {"table": ..., "row": {...}}. Rows are streamed from the database with
+    yield_per, so memory use does not grow with the size of the instance.
+    """
+    yield json.dumps({"format": EXPORT_FORMAT, "version": EXPORT_VERSION,
+                      "tables": [table.name for table in tables]}) + '\n'
+    for table in tables:
+        result = db.session.execute(
+            select(table).order_by(*table.primary_key.columns).execution_options(yield_per=batch_size))
+        for rows in result.partitions():
+            yield ''.join(json.dumps({"table": table.name, "row": dict(row._mapping)}, default=_json_default) + '\n'
+                          for row in rows)
+
+
+def gzip_chunks(chunks, level=6):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def import_lines(lines, replace=False, resume=False, seeded_rows=None, batch_size=1000):
+    """Load an NDJSON export produced by export_lines.
+
+    Rows are bulk-inserted in batches, each committed in its own transaction.
+    Rows keep their ids, so importing next to unrelated rows would skip
+    clashing parents and attach their children to the wrong projects: unless
+    replace or resume is set, ImportConflict is raised when any of the
+    exported tables already holds rows. replace=True first deletes every row
+    of those tables; only use it on the first attempt. resume=True continues
+    an interrupted import of the same file, skipping rows whose primary key
+    (or another unique key) already exists.
+
+    seeded_rows maps a table name to the column values of rows the app
+    creates on start (the default AI providers). Untouched, unreferenced
+    copies of them don't count as data and are deleted before importing, so
+    a fresh install takes a full export without replace and keeps the
+    exported rows (and API keys) rather than the seeded ones.
+    Returns {"tables": {name: {"inserted": n, "skipped": n}}}.
+    """
+    lines = iter(lines)
+    header = json.loads(next(lines, '') or 'null')
+    if not isinstance(header, dict) or header.get('format') != EXPORT_FORMAT:
+        raise ValueError("Not an export file")
+    if header.get('version') != EXPORT_VERSION:
+        raise ValueError(f"Unsupported export version {header.get('version')}")
+
+    tables = {table.name: table for table in db.metadata.sorted_tables
+              if table.name in header['tables'] and table.name not in EXCLUDED_TABLES}
+    if replace:
+        for table in reversed(db.metadata.sorted_tables):
+            if table.name in tables:
+                db.session.execute(table.delete())
+        db.session.commit()
+    else:
+        seeded = {name: _seeded(table, (seeded_rows or {}).get(name, ())) for name, table in tables.items()}
+        if not resume:
+            populated = [name for name, table in tables.items()
+                         if db.session.execute(select(table).where(~seeded[name]).limit(1)).first()]
+            if populated:
+                raise ImportConflict(populated)
+        for name, table in tables.items():
+            db.session.execute(table.delete().where(seeded[name]))
+        db.session.commit()
+
+    counts = {name: {"inserted": 0, "skipped": 0} for name in tables}
+    batch_table, batch = None, []
+    for line in lines:
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        table = tables.get(record['table'])
+        if table is None:
+            continue
+        if table is not batch_table or len(batch) >= batch_size:
+            _insert_batch(batch_table, batch, counts)
+            batch_table, batch = table, []
+        batch.append(_row_values(table, record['row']))
+    _insert_batch(batch_table, batch, counts)
+    return {"tables": counts}
+
+
+def _seeded(table, rows):
+    """Condition matching untouched copies of seeded rows that no other row refers to."""
+    if not rows:
+        return false()
+    matches = or_(*(and_(*(table.c[column].is_(None) if value is None else table.c[column] == value
+                           for column, value in row.items())) for row in rows))
+    unreferenced = [fk.column.not_in(select(fk.parent).where(fk.parent.isnot(None)))
+                    for other in db.metadata.sorted_tables for fk in other.foreign_keys if fk.column.table is table]
+    return and_(matches, *unreferenced)
+
+
+def _insert_batch(table, rows, counts):
+    if not rows:
+        return
+    statement = _insert_ignoring_conflicts(table)
+    result = db.session.execute(statement, rows)
+    db.session.commit()
+    # rowcount is summed across executemany on SQLite/PostgreSQL; -1 where unknown
+    inserted = result.rowcount if result.rowcount >= 0 else len(rows)
+    counts[table.name]["inserted"] += inserted
+    counts[table.name]["skipped"] += len(rows) - inserted
+
+
+def _insert_ignoring_conflicts(table):
+    dialect = db.engine.dialect.name
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    elif dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        return insert(table)
+    return dialect_insert(table).on_conflict_do_nothing()
+
+
+def _row_values(table, row):
+    values = {}
+    for column in table.columns:
+        if column.name not in row:
+            continue
+        value = row[column.name]
+        if value is not None and isinstance(column.type, DateTime):
+            value = datetime.fromisoformat(value)
+        elif value is not None and isinstance(column.type, LargeBinary):
+            value = base64.b64decode(value)
+        values[column.name] = value
+    return values
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, bytes):
+        return base64.b64encode(value).decode('ascii')
+    raise TypeError(f"Cannot export {type(value).__name__}")
@@ -0,0 +1,200 @@
+import json
+import queue
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, select, text
+
+from models import db, replace_trigger, Conversation, Project, ProjectEvent
+
+# (table, kind, JSON payload, columns whose change is an update event). Artifact
+# payloads use the bundle field names so clients know which part to refetch.
+EVENT_SOURCES = [
+    ('conversation', 'conversation', "json_object('id', {row}.id, 'agent_type', {row}.agent_type)", None),
+    ('project_journal', 'journal', "json_object('status', {row}.status, 'last_updated', {row}.last_updated)",
+     ['status', 'last_updated']),
+    ('project_scope', 'artifact', "json_object('artifact', 'scope')", ['last_updated']),
+    ('project_hld', 'artifact', "json_object('artifact', 'hld')", ['last_updated']),
+    ('project_lld', 'artifact', "json_object('artifact', 'lld', 'component_name', {row}.component_name)", ['last_updated']),
+    ('project_master_lld', 'artifact', "json_object('artifact', 'master_lld')", ['last_updated']),
+    ('coding_plan', 'artifact', "json_object('artifact', 'coding_plan')", ['last_updated']),
+    ('unit_test', 'artifact', "json_object('artifact', 'unit_tests', 'component_name', {row}.component_name)",
+     ['last_updated']),
+    ('project_document', 'artifact', "json_object('artifact', 'documents', 'doc_type', {row}.doc_type)", ['last_updated']),
+]
+# Kind of the row marking the newest pruned event of a project (see prune_events)
+PRUNED = 'pruned'
+PROJECT_PAYLOAD = ("json_object('name', new.name, 'average_rating', new.average_rating, "
+                   "'likes_count', new.likes_count, 'deleted', new.deleted_at IS NOT NULL)")
+
+
+def ensure_event_log(enabled=True):
+    """Create the triggers that append committed changes to project_event.
+
+    Like the search index triggers, they fire for every writer (request
+    handlers, background jobs, imports and raw SQL) and are part of the
+    writer's transaction, so an event is visible exactly when its change is.
+    Conversation events carry only ids; the broker reads the text when it
+    delivers them. With enabled=False the triggers are dropped instead, as
+    nothing would read the log. Run inside schema_lock(). Returns False when
+    the database is not SQLite.
+    """
+    if db.engine.dialect.name != 'sqlite':
+        return False
+    connection = db.session.connection()
+
+    def create(name, table, timing, payload, kind, project_id, when=None):
+        if not enabled:
+            connection.execute(text(f"DROP TRIGGER IF EXISTS {name}"))
+            return
+        replace_trigger(connection, name,
+                        f"CREATE TRIGGER {name} AFTER {timing} ON {table} " + (f"WHEN {when} " if when else "") +
+                        f"BEGIN INSERT INTO project_event (project_id, kind, payload, created_at) "
+                        f"VALUES ({project_id}, '{kind}', {payload}, strftime('%Y-%m-%d %H:%M:%f', 'now')); END")
+
+    for table, kind, payload, changed_columns in EVENT_SOURCES:
+        create(f"event_{table}_insert", table, 'INSERT', payload.format(row='new'), kind, 'new.project_id')
+        if changed_columns:
+            changed = ' OR '.join(f"old.{column} IS NOT new.{column}" for column in changed_columns)
+            create(f"event_{table}_update", table, 'UPDATE', payload.format(row='new'), kind, 'new.project_id', changed)
+    create("event_project_update", 'project', 'UPDATE', PROJECT_PAYLOAD, 'project', 'new.id',
+           "old.last_updated IS NOT new.last_updated OR old.deleted_at IS NOT new.deleted_at")
+    return True
+
+
+def prune_events(retention):
+    """Delete events older than retention seconds, keeping a marker of where each project's pruning stopped.
+
+    The newest expired event of each project becomes a PRUNED marker, so
+    EventBroker.replay() can tell a client that missed some of this project's
+    events from one that only slept through other projects'. Markers go when
+    a newer one replaces them or their project is gone.
+    """
+    events = ProjectEvent.__table__
+    cutoff = datetime.utcnow() - timedelta(seconds=retention)
+    newest_expired = (select(func.max(events.c.id)).where(events.c.created_at < cutoff)
+                      .group_by(events.c.project_id))
+    db.session.execute(events.update().where(events.c.id.in_(newest_expired)).values(kind=PRUNED, payload='{}'))
+    db.session.execute(events.delete().where(events.c.created_at < cutoff, events.c.kind != PRUNED))
+    db.session.execute(events.delete().where(
+        events.c.kind == PRUNED,
+        events.c.id.not_in(select(func.max(events.c.id)).where(events.c.kind == PRUNED).group_by(events.c.project_id))
+        | events.c.project_id.not_in(select(Project.id))))
+    db.session.commit()
+
+
+class EventBroker:
+    """Fans project_event rows out to this worker's event streams.
+
+    One thread per worker polls the change log every poll_interval seconds
+    while anyone is subscribed, so every worker sees each committed change
+    whichever process or background job made it. Old events are removed by
+    prune_events(), not here, so the log stays bounded with nobody subscribed.
+    """
+
+    def __init__(self, app, poll_interval=0.5, batch_size=500):
+        self.app = app
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self._subscribers = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._last_id = None
+
+    def latest_id(self):
+        return db.session.query(func.coalesce(func.max(ProjectEvent.id), 0)).scalar()
+
+    def subscribe(self, project_id, after_id):
+        """Return a queue that receives (id, kind, payload) for the project's events.
+
+        Events up to after_id are left to replay(); when the poller is idle it
+        resumes from after_id so nothing committed in between is skipped.
+        """
+        subscription = queue.Queue()
+        with self._lock:
+            self._ensure_started()
+            if self._last_id is None:
+                self._last_id = after_id
+            self._subscribers.setdefault(project_id, set()).add(subscription)
+        self._wake.set()
+        return subscription
+
+    def unsubscribe(self, project_id, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(project_id)
+            if subscribers:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[project_id]
+
+    def replay(self, project_id, after_id):
+        """Events for the project after after_id, or None if some of them have been pruned."""
+        pruned = (db.session.query(ProjectEvent.id)
+                  .filter(ProjectEvent.project_id == project_id, ProjectEvent.kind == PRUNED,
+                          ProjectEvent.id > after_id).first())
+        if pruned:
+            return None
+        rows = db.session.execute(select(ProjectEvent.id, ProjectEvent.project_id, ProjectEvent.kind, ProjectEvent.payload)
+                                  .where(ProjectEvent.project_id == project_id, ProjectEvent.id > after_id,
+                                         ProjectEvent.kind != PRUNED)
+                                  .order_by(ProjectEvent.id).limit(self.batch_size)).all()
+        return [event for _, event in self._events(rows)]
+
+    def _ensure_started(self):
+        # Started lazily so each gunicorn worker polls from its own thread after forking
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="event-broker", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                idle = not self._subscribers
+                if idle:
+                    # Nothing to deliver; the next subscriber sets where to resume
+                    self._last_id = None
+            if idle:
+                self._wake.wait()
+                self._wake.clear()
+                continue
+            try:
+                with self.app.app_context():
+                    self._poll()
+            except Exception:
+                self.app.logger.error("Polling project events failed", exc_info=True)
+            time.sleep(self.poll_interval)
+
+    def _poll(self):
+        with self._lock:
+            last_id = self._last_id
+        if last_id is None:
+            return
+        rows = db.session.execute(select(ProjectEvent.id, ProjectEvent.project_id, ProjectEvent.kind, ProjectEvent.payload)
+                                  .where(ProjectEvent.id > last_id, ProjectEvent.kind != PRUNED)
+                                  .order_by(ProjectEvent.id).limit(self.batch_size)).all()
+        if rows:
+            with self._lock:
+                self._last_id = rows[-1].id
+                wanted = [row for row in rows if row.project_id in self._subscribers]
+            for project_id, event in self._events(wanted):
+                with self._lock:
+                    subscribers = list(self._subscribers.get(project_id, ()))
+                for subscription in subscribers:
+                    subscription.put(event)
+
+    def _events(self, rows):
+        # Conversation events are delivered with their text, read in one query
+        conversation_ids = [json.loads(row.payload)['id'] for row in rows if row.kind == 'conversation']
+        contents = dict(db.session.query(Conversation.id, Conversation.content)
+                        .filter(Conversation.id.in_(conversation_ids)).all()) if conversation_ids else {}
+        events = []
+        for row in rows:
+            payload = json.loads(row.payload)
+            if row.kind == 'conversation':
+                if payload['id'] not in contents:
+                    continue  # Deleted since, e.g. by clearing the chat history
+                payload['content'] = contents[payload['id']]
+            events.append((row.project_id, (row.id, row.kind, payload)))
+        return events
@@ -7,9 +7,17 @@ bind = "127.0.0.1:8000"  # Changed to localhost for security
 backlog = 2048
 
 # Worker processes
-workers = multiprocessing.cpu_count() * 2 + 1
-worker_class = 'sync'
-worker_connections = 1000
+# 'sync' handles one request per process. 'gevent' (requires the gevent package)
+# serves many requests per process cooperatively, so chats waiting on an AI
+# provider no longer pin a whole process each.
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "sync")
+if worker_class == 'gevent':
+    workers = multiprocessing.cpu_count() + 1
+else:
+    workers = multiprocessing.cpu_count() * 2 + 1
+worker_connections = int(os.environ.get("GUNICORN_WORKER_CONNECTIONS", 1000))
+# Each open project event stream would pin a sync worker, so they are only served by gevent workers
+os.environ.setdefault("EVENT_STREAMS_ENABLED", "true" if worker_class == 'gevent' else "false")
 timeout = 30
 keepalive = 2
 
@@ -27,21 +35,34 @@ pidfile = "gunicorn.pid"
 worker_tmp_dir = "/dev/shm"
 tmp_upload_dir = None
 
+# Metrics from all workers are shared through files here and aggregated by /metrics
+prometheus_multiproc_dir = os.environ.setdefault(
+    "PROMETHEUS_MULTIPROC_DIR", os.path.join(worker_tmp_dir, "ai_project_manager_metrics"))
+
 # Logging
 errorlog = "error.log"
+# The app logs to stderr from its own listener thread (structured_logging.py); send that to errorlog too
+capture_output = True
 loglevel = 'info'
 accesslog = "access.log"
-access_log_format = '%(h)s %(l)s %(u)s %(t)s "%(r)s" %(s)s %(b)s "%(f)s" "%(a)s"'
+access_log_format = '%(h)s %(l)s %(u)s %(t)s "%(r)s" %(s)s %(b)s "%(f)s" "%(a)s" %(D)s'  # %(D)s: duration in microseconds
 
 # Process naming
 proc_name = "ai_project_manager"
 
 # Server hooks
 def on_starting(server):
-    pass
+    # Start every run with empty metrics
+    os.makedirs(prometheus_multiproc_dir, exist_ok=True)
+    for name in os.listdir(prometheus_multiproc_dir):
+        os.remove(os.path.join(prometheus_multiproc_dir, name))
 
 def on_reload(server):
     pass
 
 def on_exit(server):
     pass
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,149 @@
+import gzip
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+from flask import Response, jsonify, request
+from werkzeug.http import is_resource_modified
+
+try:
+    import brotli
+except ImportError:  # Optional: responses are gzip-compressed without it
+    brotli = None
+
+COMPRESSIBLE_TYPES = ('application/json', 'application/javascript', 'text/html', 'text/css', 'text/javascript', 'text/plain')
+
+
+class StaticAssets:
+    """Content hashes of static files, used to fingerprint their URLs.
+
+    Hashes are recomputed when a file's mtime changes. Compressed bodies of
+    static files are kept in a small LRU keyed by file hash and encoding, so
+    app.js and style.css are compressed once per deploy rather than per request.
+    """
+
+    def __init__(self, static_folder, max_compressed=32):
+        self.static_folder = static_folder
+        self.max_compressed = max_compressed
+        self._hashes = {}
+        self._compressed = OrderedDict()
+        self._lock = threading.Lock()
+
+    def fingerprint(self, filename):
+        path = os.path.join(self.static_folder, filename)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+        with self._lock:
+            entry = self._hashes.get(filename)
+            if entry and entry[0] == mtime:
+                return entry[1]
+        with open(path, 'rb') as f:
+            digest = hashlib.sha256(f.read()).hexdigest()[:12]
+        with self._lock:
+            self._hashes[filename] = (mtime, digest)
+        return digest
+
+    def compressed(self, key, compress):
+        with self._lock:
+            if key in self._compressed:
+                self._compressed.move_to_end(key)
+                return self._compressed[key]
+        data = compress()
+        with self._lock:
+            self._compressed[key] = data
+            while len(self._compressed) > self.max_compressed:
+                self._compressed.popitem(last=False)
+        return data
+
+
+def cached_json(etag, last_modified, build):
+    """Answer 304 if the client's copy matches etag/last_modified, else jsonify(build()).
+
+    Callers derive the validators from cheap queries (row counts and
+    last_updated stamps), so build() and the content it loads are skipped
+    entirely for unchanged resources.
+    """
+    if is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        response = jsonify(build())
+    else:
+        response = Response(status=304)
+    response.set_etag(etag)
+    if last_modified:
+        response.last_modified = last_modified
+    # Keep the copy but revalidate it on every use
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+def init_app(app):
+    """Compress responses, and fingerprint static URLs so they can be cached for good.
+
+    Responses of a compressible type and at least COMPRESS_MIN_SIZE bytes are
+    sent with brotli (if installed) or gzip, whichever the client accepts.
+    Streamed responses (chat streams, exports) are left alone. Compressing a
+    response turns its ETag weak, which If-None-Match still matches.
+
+    url_for('static', ...) adds ?v=<content hash>; requests carrying the
+    current hash are cacheable for STATIC_MAX_AGE seconds.
+    """
+    assets = StaticAssets(app.static_folder)
+    min_size = app.config['COMPRESS_MIN_SIZE']
+    gzip_level = app.config['COMPRESS_LEVEL']
+    brotli_quality = app.config['COMPRESS_BROTLI_QUALITY']
+    static_max_age = app.config['STATIC_MAX_AGE']
+
+    @app.url_defaults
+    def fingerprint_static_url(endpoint, values):
+        if endpoint == 'static' and 'filename' in values and 'v' not in values:
+            digest = assets.fingerprint(values['filename'])
+            if digest:
+                values['v'] = digest
+
+    def choose_encoding():
+        if brotli is not None and request.accept_encodings['br']:
+            return 'br'
+        if request.accept_encodings['gzip']:
+            return 'gzip'
+        return None
+
+    def compress(data, encoding):
+        if encoding == 'br':
+            return brotli.compress(data, quality=brotli_quality)
+        return gzip.compress(data, compresslevel=gzip_level, mtime=0)
+
+    @app.after_request
+    def cache_and_compress(response):
+        static = request.endpoint == 'static'
+        if static and response.status_code in (200, 304) and request.args.get('v'):
+            if request.args['v'] == assets.fingerprint(request.view_args.get('filename', '')):
+                response.cache_control.no_cache = None
+                response.cache_control.public = True
+                response.cache_control.max_age = static_max_age
+                response.cache_control.immutable = True
+
+        # Static files are sent as file wrappers, which count as streamed
+        static_file = static and response.direct_passthrough
+        if (response.status_code != 200 or (response.is_streamed and not static_file)
+                or response.mimetype not in COMPRESSIBLE_TYPES
+                or 'Content-Encoding' in response.headers or response.cache_control.no_transform):
+            return response
+        response.vary.add('Accept-Encoding')
+        encoding = choose_encoding()
+        if encoding is None or (response.content_length or 0) < min_size:
+            return response
+
+        response.direct_passthrough = False
+        data = response.get_data()
+        etag, weak = response.get_etag()
+        if static_file and etag:
+            data = assets.compressed((etag, encoding), lambda: compress(data, encoding))
+        else:
+            data = compress(data, encoding)
+        response.set_data(data)
+        response.headers['Content-Encoding'] = encoding
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
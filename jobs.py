@@ -0,0 +1,57 @@
+import queue
+import threading
+
+
+class JobQueue:
+    """In-process background job queue served by a small pool of worker threads.
+
+    Jobs are keyed so that repeated submissions for the same key (e.g. the same
+    project) coalesce while one is still waiting in the queue. Jobs sharing a key
+    never run concurrently. Each job runs inside the Flask application context.
+    """
+
+    def __init__(self, app, workers=2):
+        self.app = app
+        self.workers = workers
+        self._queue = queue.Queue()
+        self._pending = set()
+        self._key_locks = {}
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def submit(self, key, func, *args, **kwargs):
+        """Queue func(*args, **kwargs). Returns False if key is already queued."""
+        with self._lock:
+            self._ensure_started()
+            if key in self._pending:
+                return False
+            self._pending.add(key)
+        self._queue.put((key, func, args, kwargs))
+        return True
+
+    def _ensure_started(self):
+        # Threads are started lazily so each gunicorn worker gets its own pool
+        # after forking, rather than inheriting dead threads from the master.
+        if self._threads:
+            return
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _key_lock(self, key):
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def _work(self):
+        while True:
+            key, func, args, kwargs = self._queue.get()
+            with self._lock:
+                self._pending.discard(key)
+            try:
+                with self._key_lock(key), self.app.app_context():
+                    func(*args, **kwargs)
+            except Exception:
+                self.app.logger.error("Background job %r failed", key, exc_info=True)
+            finally:
+                self._queue.task_done()
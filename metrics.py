@@ -0,0 +1,85 @@
+import os
+import time
+
+from flask import Response, g, has_request_context, request
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest, multiprocess
+from sqlalchemy import event
+
+# With PROMETHEUS_MULTIPROC_DIR set (see gunicorn_config.py) every worker
+# writes its samples to files there and /metrics aggregates all of them.
+
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds', 'HTTP request latency by route',
+    ['endpoint', 'method', 'status']
+)
+REQUEST_DB_QUERIES = Histogram(
+    'http_request_db_queries', 'Database queries executed per request',
+    ['endpoint'], buckets=(0, 1, 2, 5, 10, 20, 50, 100, 250)
+)
+REQUEST_DB_SECONDS = Histogram(
+    'http_request_db_seconds', 'Time spent in database queries per request',
+    ['endpoint'], buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+)
+LLM_LATENCY = Histogram(
+    'llm_request_duration_seconds', 'AI provider call latency',
+    ['provider', 'model', 'agent_type'], buckets=(0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+)
+LLM_TOKENS = Counter(
+    'llm_tokens', 'Tokens reported by AI providers',
+    ['provider', 'model', 'agent_type', 'kind']
+)
+
+
+def init_app(app, engine):
+    @app.before_request
+    def start_request_timer():
+        g.request_started = time.perf_counter()
+        g.db_queries = 0
+        g.db_seconds = 0.0
+
+    @app.after_request
+    def record_request(response):
+        if 'request_started' in g:
+            endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+            REQUEST_LATENCY.labels(endpoint, request.method, response.status_code).observe(
+                time.perf_counter() - g.request_started)
+            REQUEST_DB_QUERIES.labels(endpoint).observe(g.db_queries)
+            REQUEST_DB_SECONDS.labels(endpoint).observe(g.db_seconds)
+        return response
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def start_query_timer(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def record_query(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['query_started'].pop()
+        if has_request_context() and 'db_queries' in g:
+            g.db_queries += 1
+            g.db_seconds += elapsed
+
+    @app.route('/metrics')
+    def metrics():
+        if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+            registry = CollectorRegistry()
+            multiprocess.MultiProcessCollector(registry)
+        else:
+            registry = REGISTRY
+        return Response(generate_latest(registry), mimetype=CONTENT_TYPE_LATEST)
+
+
+def record_llm_call(provider, model, agent_type, seconds, usage=None):
+    labels = (provider.name, model or '', agent_type or '')
+    LLM_LATENCY.labels(*labels).observe(seconds)
+    for kind, count in (usage or {}).items():
+        if count:
+            LLM_TOKENS.labels(*labels, kind).inc(count)
+
+
+def token_usage(response_json):
+    """Extract prompt/completion token counts from an Ollama or OpenAI-style response."""
+    usage = response_json.get('usage') or {}
+    return {
+        'prompt': usage.get('prompt_tokens') or response_json.get('prompt_eval_count'),
+        'completion': usage.get('completion_tokens') or response_json.get('eval_count'),
+    }
@@ -1,9 +1,109 @@
+import hashlib
+import json
+import zlib
+from contextlib import contextmanager
 from datetime import datetime
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event, inspect, insert, select, text
+from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy.orm import declared_attr, deferred, joinedload, undefer
+from sqlalchemy.schema import CreateTable
 from sqlalchemy.sql import func
 
+try:
+    import zstandard
+except ImportError:  # Optional: blobs are compressed with zlib without it
+    zstandard = None
+
 db = SQLAlchemy()
 
+BLOB_CODECS = ('zlib', 'zstd') if zstandard is not None else ('zlib',)
+
+def compress_text(codec, value):
+    data = value.encode('utf-8')
+    if codec == 'zstd':
+        return zstandard.ZstdCompressor(level=9).compress(data)
+    return zlib.compress(data, 6)
+
+def decompress_text(codec, data):
+    if codec == 'zstd':
+        return zstandard.ZstdDecompressor().decompress(data).decode('utf-8')
+    return zlib.decompress(data).decode('utf-8')
+
+class ContentBlob(db.Model):
+    """Compressed artifact text, stored once per distinct body and keyed by its SHA-256."""
+
+    # Set from BLOB_MIN_SIZE and BLOB_COMPRESSION at startup
+    min_size = 1024
+    codec_name = 'zlib'
+
+    hash = db.Column(db.String(64), primary_key=True)
+    codec = db.Column(db.String(8), nullable=False)  # zlib or zstd
+    size = db.Column(db.Integer, nullable=False)  # Uncompressed length in characters
+    data = db.Column(db.LargeBinary, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    @property
+    def text(self):
+        return decompress_text(self.codec, self.data)
+
+    @classmethod
+    def store(cls, value):
+        """Return the blob holding value, creating it if needed, or None if value is short enough to keep inline."""
+        if value is None or len(value) < cls.min_size:
+            return None
+        digest = hashlib.sha256(value.encode('utf-8')).hexdigest()
+        # INSERT OR IGNORE so concurrent writers of the same body don't collide
+        db.session.execute(insert(cls).prefix_with('OR IGNORE', dialect='sqlite').values(
+            hash=digest, codec=cls.codec_name, size=len(value),
+            data=compress_text(cls.codec_name, value), created_at=datetime.utcnow()))
+        return db.session.get(cls, digest)
+
+class BlobContentMixin:
+    """A content attribute that keeps large bodies in content_blob.
+
+    Text shorter than ContentBlob.min_size stays in the content column; longer
+    text is compressed into a shared ContentBlob referenced by content_hash.
+    Both are loaded only when .content is read; use load_content() to fetch
+    them with the rows instead.
+    """
+
+    @declared_attr
+    def _content(cls):
+        return deferred(db.Column('content', db.Text))
+
+    @declared_attr
+    def content_hash(cls):
+        return db.Column(db.String(64), db.ForeignKey('content_blob.hash'), index=True)
+
+    @declared_attr
+    def content_blob(cls):
+        return db.relationship(ContentBlob, lazy='select')
+
+    @hybrid_property
+    def content(self):
+        blob = self.content_blob
+        return blob.text if blob is not None else self._content
+
+    @content.inplace.setter
+    def _content_setter(self, value):
+        blob = ContentBlob.store(value)
+        self.content_blob = blob
+        self.content_hash = blob.hash if blob is not None else None
+        self._content = None if blob is not None else value
+
+    @content.inplace.expression
+    @classmethod
+    def _content_expression(cls):
+        # blob_text() is registered on every SQLite connection by configure_sqlite()
+        return func.coalesce(cls._content, select(func.blob_text(ContentBlob.codec, ContentBlob.data))
+                             .where(ContentBlob.hash == cls.content_hash).scalar_subquery())
+
+    @classmethod
+    def load_content(cls):
+        """Loader options that fetch content together with the rows."""
+        return undefer(cls._content), joinedload(cls.content_blob)
+
 class Project(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
@@ -16,67 +116,126 @@ class Project(db.Model):
     timeline = db.Column(db.String(100))
     challenges = db.Column(db.Text)
     creation_date = db.Column(db.DateTime, default=datetime.utcnow)
-    last_updated = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    last_updated = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
     ai_agents = db.Column(db.Text)  # Store as JSON string
+    deleted_at = db.Column(db.DateTime, index=True)  # Soft-deleted, waiting for purge_project()
 
-class ProjectDocument(db.Model):
+class ProjectDocument(BlobContentMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    project_id = db.Column(db.Integer, db.ForeignKey('project.id'), nullable=False)
+    project_id = db.Column(db.Integer, db.ForeignKey('project.id', ondelete='CASCADE'), nullable=False, index=True)
     doc_type = db.Column(db.String(20), nullable=False)
-    content = db.Column(db.Text)
     last_updated = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
-class ProjectScope(db.Model):
+class ProjectScope(BlobContentMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    project_id = db.Column(db.Integer, db.ForeignKey('project.id'), nullable=False)
-    content = db.Column(db.Text)
+    project_id = db.Column(db.Integer, db.ForeignKey('project.id', ondelete='CASCADE'), nullable=False, index=True)
+    input_hash = db.Column(db.String(64))  # Hash of the pipeline inputs it was generated from
     last_updated = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
-class ProjectHLD(db.Model):
+class ProjectHLD(BlobContentMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    project_id = db.Column(db.Integer, db.ForeignKey('project.id'), nullable=False)
-    content = db.Column(db.Text)
+    project_id = db.Column(db.Integer, db.ForeignKey('project.id', ondelete='CASCADE'), nullable=False, index=True)
+    input_hash = db.Column(db.String(64))
     last_updated = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
-class ProjectLLD(db.Model):
+class ProjectLLD(BlobContentMixin, db.Model):
+    __table_args__ = (db.Index('ix_project_lld_project_component', 'project_id', 'component_name', unique=True),)
+
     id = db.Column(db.Integer, primary_key=True)
-    project_id = db.Column(db.Integer, db.ForeignKey('project.id'), nullable=False)
+    project_id = db.Column(db.Integer, db.ForeignKey('project.id', ondelete='CASCADE'), nullable=False)
     component_name = db.Column(db.String(100), nullable=False)
-    content = db.Column(db.Text)
+    input_hash = db.Column(db.String(64))
     last_updated = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
-class ProjectMasterLLD(db.Model):
+class ProjectMasterLLD(BlobContentMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    project_id = db.Column(db.Integer, db.ForeignKey('project.id'), nullable=False)
-    content = db.Column(db.Text)
+    project_id = db.Column(db.Integer, db.ForeignKey('project.id', ondelete='CASCADE'), nullable=False, index=True)
+    input_hash = db.Column(db.String(64))
     last_updated = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
-class CodingPlan(db.Model):
+class CodingPlan(BlobContentMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    project_id = db.Column(db.Integer, db.ForeignKey('project.id'), nullable=False)
-    content = db.Column(db.Text)
+    project_id = db.Column(db.Integer, db.ForeignKey('project.id', ondelete='CASCADE'), nullable=False, index=True)
+    input_hash = db.Column(db.String(64))
     last_updated = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
-class UnitTest(db.Model):
+class UnitTest(BlobContentMixin, db.Model):
+    __table_args__ = (db.Index('ix_unit_test_project_component', 'project_id', 'component_name', unique=True),)
+
     id = db.Column(db.Integer, primary_key=True)
-    project_id = db.Column(db.Integer, db.ForeignKey('project.id'), nullable=False)
+    project_id = db.Column(db.Integer, db.ForeignKey('project.id', ondelete='CASCADE'), nullable=False)
     component_name = db.Column(db.String(100), nullable=False)
-    content = db.Column(db.Text)
+    input_hash = db.Column(db.String(64))
     last_updated = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
-class ProjectJournal(db.Model):
+class ProjectJournal(BlobContentMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    project_id = db.Column(db.Integer, db.ForeignKey('project.id'), nullable=False)
-    content = db.Column(db.Text)
+    project_id = db.Column(db.Integer, db.ForeignKey('project.id', ondelete='CASCADE'), nullable=False, index=True)
+    status = db.Column(db.String(20), default='fresh')  # pending, fresh or stale
+    last_conversation_id = db.Column(db.Integer)  # Watermark of the last conversation folded in
+    claimed_until = db.Column(db.DateTime)  # Lease of the worker regenerating it
     last_updated = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
-class Conversation(db.Model):
+class Conversation(BlobContentMixin, db.Model):
+    __table_args__ = (db.Index('ix_conversation_project_timestamp', 'project_id', 'timestamp'),)
+
     id = db.Column(db.Integer, primary_key=True)
-    project_id = db.Column(db.Integer, db.ForeignKey('project.id'), nullable=False)
+    project_id = db.Column(db.Integer, db.ForeignKey('project.id', ondelete='CASCADE'), nullable=False)
     agent_type = db.Column(db.String(50), nullable=False)
-    content = db.Column(db.Text)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
 
+class ProjectLike(db.Model):
+    __table_args__ = (db.Index('ix_project_like_project_user', 'project_id', 'user_id', unique=True),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    project_id = db.Column(db.Integer, db.ForeignKey('project.id', ondelete='CASCADE'), nullable=False)
+    user_id = db.Column(db.String(100), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class PipelineJob(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    project_id = db.Column(db.Integer, db.ForeignKey('project.id', ondelete='CASCADE'), nullable=False, index=True)
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, completed or failed
+    current_stage = db.Column(db.String(50))
+    progress = db.Column(db.JSON, default=list)  # One entry per generated or skipped artifact
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    last_updated = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class ArtifactRevision(db.Model):
+    """One saved version of a project artifact. Rows are only ever appended.
+
+    data holds either the full text (snapshot) or a line delta against the
+    previous revision, compressed with codec; see revisions.RevisionStore.
+    """
+    __table_args__ = (db.Index('ix_artifact_revision_lookup', 'project_id', 'artifact', 'revision', unique=True),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    project_id = db.Column(db.Integer, db.ForeignKey('project.id', ondelete='CASCADE'), nullable=False)
+    artifact = db.Column(db.String(20), nullable=False)  # scope, hld, master_lld, coding_plan or journal
+    revision = db.Column(db.Integer, nullable=False)  # 1, 2, ... per project and artifact
+    snapshot = db.Column(db.Boolean, nullable=False, default=False)
+    codec = db.Column(db.String(8), nullable=False)
+    data = db.Column(db.LargeBinary, nullable=False)
+    size = db.Column(db.Integer, nullable=False)  # Length of the full text
+    content_hash = db.Column(db.String(64), nullable=False)  # SHA-256 of the full text
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class ProjectEvent(db.Model):
+    """Change log behind the per-project event streams, written by triggers (see events.py).
+
+    Ids are AUTOINCREMENT so they are never reused after pruning and can serve
+    as SSE event ids. project_id has no foreign key so that a deleted project's
+    last events outlive its purge; rows are only removed by age.
+    """
+    __table_args__ = (db.Index('ix_project_event_project_id', 'project_id', 'id'), {'sqlite_autoincrement': True})
+
+    id = db.Column(db.Integer, primary_key=True)
+    project_id = db.Column(db.Integer, nullable=False)
+    kind = db.Column(db.String(20), nullable=False)  # conversation, journal, artifact or project
+    payload = db.Column(db.Text, nullable=False)  # JSON object
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
 class AIProvider(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(50), nullable=False)
@@ -85,8 +244,199 @@ class AIProvider(db.Model):
 
 class AIAgentConfig(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    agent_type = db.Column(db.String(50), nullable=False)
+    agent_type = db.Column(db.String(50), nullable=False, unique=True, index=True)
     provider_id = db.Column(db.Integer, db.ForeignKey('ai_provider.id'), nullable=False)
     model_name = db.Column(db.String(50), nullable=False)
     system_prompt = db.Column(db.Text)
     temperature = db.Column(db.Float, default=0.95)
+
+class ConfigVersion(db.Model):
+    # Single row bumped whenever providers or agent configs change (see config_cache.py)
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+def configure_sqlite(engine, pragmas):
+    """Apply PRAGMA settings, and register blob_text(), on every new connection of a SQLite engine.
+
+    blob_text(codec, data) lets SQL (the search triggers and BlobContentMixin's
+    content expression) read ContentBlob text.
+    """
+    if engine.dialect.name != 'sqlite':
+        return
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+        cursor.close()
+        dbapi_connection.create_function('blob_text', 2, decompress_text, deterministic=True)
+
+def replace_trigger(connection, name, sql):
+    """Create or update a SQLite trigger from its CREATE TRIGGER statement.
+
+    Nothing is done when sqlite_master already holds the same definition, so
+    unchanged triggers are left alone on every start.
+    """
+    existing = connection.execute(text("SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = :name"),
+                                  {'name': name}).scalar()
+    if existing == sql:
+        return
+    if existing is not None:
+        connection.execute(text(f"DROP TRIGGER IF EXISTS {name}"))
+    connection.execute(text(sql.replace('CREATE TRIGGER', 'CREATE TRIGGER IF NOT EXISTS', 1)))
+
+@contextmanager
+def schema_lock(timeout=600):
+    """Run schema checks and upgrades as one transaction holding SQLite's write lock.
+
+    Every gunicorn worker runs init_db() as it boots. BEGIN IMMEDIATE makes the
+    others wait (up to timeout seconds) while the first one upgrades; they then
+    inspect the upgraded schema and find nothing left to do. Everything inside
+    must go through db.session without committing; the block commits once.
+    """
+    connection = db.session.connection()
+    if db.engine.dialect.name == 'sqlite':
+        # busy_timeout only matters while waiting for the lock
+        busy_timeout = connection.exec_driver_sql('PRAGMA busy_timeout').scalar()
+        connection.exec_driver_sql(f'PRAGMA busy_timeout = {int(timeout * 1000)}')
+        try:
+            connection.exec_driver_sql('BEGIN IMMEDIATE')
+        finally:
+            connection.exec_driver_sql(f'PRAGMA busy_timeout = {busy_timeout}')
+    try:
+        yield connection
+    except Exception:
+        db.session.rollback()
+        raise
+    db.session.commit()
+
+def create_schema():
+    """Create missing tables and bring existing ones up to date. Run inside schema_lock()."""
+    db.metadata.create_all(bind=db.session.connection())
+    upgrade_schema()
+    migrate_legacy_likes()
+
+def upgrade_schema():
+    """Add columns, foreign key actions and indexes introduced after the database was first created.
+
+    create_all() only creates missing tables, so existing app.db files need
+    new columns and indexes added in place, and tables whose foreign keys lack
+    the declared ON DELETE action rebuilt (see rebuild_foreign_keys). Before a
+    unique index is created, duplicate rows are dropped, keeping the oldest one
+    (the row the app has always read with .first()).
+    """
+    inspector = inspect(db.session.connection())
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing_columns = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing_columns:
+                column_type = column.type.compile(dialect=db.engine.dialect)
+                db.session.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+
+    rebuild_foreign_keys()
+
+    inspector = inspect(db.session.connection())
+    for table in db.metadata.sorted_tables:
+        existing_indexes = {index['name'] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name in existing_indexes:
+                continue
+            if index.unique:
+                columns = ', '.join(column.name for column in index.columns)
+                db.session.execute(text(f'DELETE FROM {table.name} WHERE id NOT IN '
+                                        f'(SELECT MIN(id) FROM {table.name} GROUP BY {columns})'))
+            index.create(bind=db.session.connection())
+
+def rebuild_foreign_keys():
+    """Recreate SQLite tables whose foreign keys lack the ON DELETE action declared on the model.
+
+    SQLite can't alter constraints in place, so the table is copied into a new
+    one with the current definition, then swapped in. Rows whose parent no
+    longer exists (left behind by older project deletes) are deleted first, so
+    the copy satisfies the constraint. Indexes are recreated by upgrade_schema()
+    and search triggers by ensure_search_index().
+    """
+    if db.engine.dialect.name != 'sqlite':
+        return
+    inspector = inspect(db.session.connection())
+    for table in db.metadata.sorted_tables:
+        cascading = [fk for fk in table.foreign_keys if fk.ondelete]
+        existing = {(tuple(fk['constrained_columns']), (fk.get('options') or {}).get('ondelete', '').upper())
+                    for fk in inspector.get_foreign_keys(table.name)}
+        if all(((fk.parent.name,), fk.ondelete.upper()) in existing for fk in cascading):
+            continue
+
+        orphaned = ' OR '.join(f'{fk.parent.name} NOT IN (SELECT {fk.column.name} FROM {fk.column.table.name})'
+                               for fk in cascading)
+        db.session.execute(text(f'DELETE FROM {table.name} WHERE {orphaned}'))
+
+        rebuilt = table.to_metadata(db.metadata, name=f'{table.name}__rebuild')
+        try:
+            columns = ', '.join(column.name for column in table.columns)
+            db.session.execute(CreateTable(rebuilt))
+            db.session.execute(text(f'INSERT INTO {rebuilt.name} ({columns}) SELECT {columns} FROM {table.name}'))
+            db.session.execute(text(f'DROP TABLE {table.name}'))
+            db.session.execute(text(f'ALTER TABLE {rebuilt.name} RENAME TO {table.name}'))
+        finally:
+            db.metadata.remove(rebuilt)
+
+def blob_content_models():
+    return [mapper.class_ for mapper in db.Model.registry.mappers if issubclass(mapper.class_, BlobContentMixin)]
+
+def compact_content(batch_size=500):
+    """Move inline content of at least ContentBlob.min_size characters into blobs.
+
+    Used for rows written before the blob store existed, one short transaction
+    per batch. last_updated is left untouched. Returns the number of rows moved.
+    """
+    moved = 0
+    for model in blob_content_models():
+        table = model.__table__
+        while True:
+            rows = db.session.execute(select(table.c.id, table.c.content).where(
+                table.c.content_hash.is_(None), func.length(table.c.content) >= ContentBlob.min_size
+            ).limit(batch_size)).all()
+            for row_id, content in rows:
+                values = {'content': None, 'content_hash': ContentBlob.store(content).hash}
+                if 'last_updated' in table.c:
+                    values['last_updated'] = table.c.last_updated
+                db.session.execute(table.update().where(table.c.id == row_id).values(**values))
+            db.session.commit()
+            moved += len(rows)
+            if len(rows) < batch_size:
+                break
+    return moved
+
+def collect_unused_blobs(batch_size=500):
+    """Delete blobs no row refers to any more (e.g. earlier journal versions). Returns the number deleted."""
+    referenced = [select(model.__table__.c.content_hash).where(model.__table__.c.content_hash.isnot(None))
+                  for model in blob_content_models()]
+    unused = select(ContentBlob.hash).where(ContentBlob.hash.not_in(referenced[0].union(*referenced[1:])))
+    deleted = 0
+    while True:
+        count = db.session.execute(ContentBlob.__table__.delete().where(
+            ContentBlob.hash.in_(unused.limit(batch_size)))).rowcount
+        db.session.commit()
+        deleted += count
+        if count < batch_size:
+            return deleted
+
+def migrate_legacy_likes():
+    """Move likes from the old project.likes JSON list into project_like rows.
+
+    Runs once per project: the JSON list is cleared after it has been copied,
+    and likes_count is recomputed for every project that has no count yet.
+    """
+    columns = {column['name'] for column in inspect(db.session.connection()).get_columns('project')}
+    if 'likes' in columns:
+        rows = db.session.execute(text("SELECT id, likes FROM project WHERE likes IS NOT NULL AND likes NOT IN ('[]', 'null')"))
+        for project_id, likes in rows.fetchall():
+            for user_id in dict.fromkeys(str(user_id) for user_id in json.loads(likes)):
+                db.session.add(ProjectLike(project_id=project_id, user_id=user_id))
+            db.session.execute(text("UPDATE project SET likes = '[]', likes_count = NULL WHERE id = :id"), {'id': project_id})
+    db.session.execute(text("UPDATE project SET likes_count = "
+                            "(SELECT COUNT(*) FROM project_like WHERE project_like.project_id = project.id) "
+                            "WHERE likes_count IS NULL"))
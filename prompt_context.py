@@ -0,0 +1,110 @@
+import threading
+from collections import OrderedDict
+
+from models import db, Conversation, ProjectJournal
+
+
+def estimate_tokens(text):
+    """Cheap token estimate (about four characters per token for English and code)."""
+    return (len(text or '') + 3) // 4
+
+
+def truncate_to_tokens(text, tokens):
+    limit = tokens * 4
+    if len(text) <= limit:
+        return text
+    return text[:max(limit - 6, 0)] + ' [...]'
+
+
+def render_prompt(messages):
+    """Flatten chat messages into a single prompt for completion-style APIs (Ollama)."""
+    lines = [f"{message['role'].capitalize()}: {message['content']}" for message in messages]
+    return '\n\n'.join(lines + ['Assistant:'])
+
+
+class ContextBuilder:
+    """Assembles chat prompts that stay within a per-model token budget.
+
+    A prompt is the cached per-project prefix (agent system prompt, project
+    summary and the journal as long-term memory, capped at memory_share of the
+    budget) followed by as many of the most recent turns as still fit, verbatim,
+    and the new user message. Prefixes are rebuilt only when the agent settings,
+    the project summary or the journal change.
+    """
+
+    def __init__(self, default_budget=4096, model_budgets=None, response_tokens=1024,
+                 memory_share=0.25, max_turns=40, max_prefixes=256):
+        self.default_budget = default_budget
+        self.model_budgets = model_budgets or {}
+        self.response_tokens = response_tokens
+        self.memory_share = memory_share
+        self.max_turns = max_turns
+        self.max_prefixes = max_prefixes
+        self._prefixes = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            default_budget=config['CONTEXT_TOKEN_BUDGET'],
+            model_budgets=config['CONTEXT_MODEL_TOKEN_BUDGETS'],
+            response_tokens=config['CONTEXT_RESPONSE_TOKENS'],
+            memory_share=config['CONTEXT_MEMORY_SHARE'],
+            max_turns=config['CONTEXT_MAX_TURNS'],
+        )
+
+    def budget(self, model_name):
+        """Prompt token budget for a model, leaving room for the response."""
+        matches = [model for model in self.model_budgets if (model_name or '').startswith(model)]
+        total = self.model_budgets[max(matches, key=len)] if matches else self.default_budget
+        return max(total - self.response_tokens, 0)
+
+    def build(self, agent_config, project_id, summary, message):
+        """Return (messages, stats) for a new user message."""
+        budget = self.budget(agent_config.model_name)
+        prefix, prefix_tokens = self._prefix(agent_config, project_id, summary, budget)
+        remaining = budget - prefix_tokens - estimate_tokens(message)
+
+        turns = []
+        recent = (db.session.query(Conversation.agent_type, Conversation.content)
+                  .filter(Conversation.project_id == project_id)
+                  .order_by(Conversation.timestamp.desc(), Conversation.id.desc())
+                  .limit(self.max_turns))
+        for agent_type, content in recent:
+            tokens = estimate_tokens(content)
+            if tokens > remaining:
+                break
+            remaining -= tokens
+            turns.append({"role": "user" if agent_type == 'user' else "assistant", "content": content or ''})
+        turns.reverse()
+
+        messages = prefix + turns + [{"role": "user", "content": message}]
+        stats = {'budget': budget, 'tokens': budget - remaining, 'turns': len(turns)}
+        return messages, stats
+
+    def _prefix(self, agent_config, project_id, summary, budget):
+        journal_updated = (db.session.query(ProjectJournal.last_updated)
+                           .filter_by(project_id=project_id).scalar())
+        key = (agent_config, project_id, summary, journal_updated, budget)
+        with self._lock:
+            cached = self._prefixes.get(key)
+            if cached:
+                self._prefixes.move_to_end(key)
+                return cached
+
+        prefix = [
+            {"role": "system", "content": agent_config.system_prompt or ''},
+            {"role": "system", "content": summary},
+        ]
+        journal = (db.session.query(ProjectJournal.content)
+                   .filter_by(project_id=project_id).scalar()) if journal_updated else None
+        if journal:
+            memory = truncate_to_tokens(journal, int(budget * self.memory_share))
+            prefix.append({"role": "system", "content": f"Project journal (summary of the conversation so far):\n{memory}"})
+        cached = (prefix, sum(estimate_tokens(item['content']) for item in prefix))
+
+        with self._lock:
+            self._prefixes[key] = cached
+            while len(self._prefixes) > self.max_prefixes:
+                self._prefixes.popitem(last=False)
+        return cached
@@ -0,0 +1,87 @@
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+class ProviderClients:
+    """Pooled, keep-alive HTTP sessions for AI provider calls.
+
+    One requests.Session is kept per AIProvider row in each worker process, so
+    repeated calls reuse connections (and TLS sessions) instead of opening a new
+    one every time. Sessions are rebuilt when a provider's URL changes and can be
+    dropped explicitly when a provider is edited.
+    """
+
+    RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+    def __init__(self, pool_size=10, keep_alive=True, connect_timeout=5, read_timeout=30,
+                 max_retries=3, retry_backoff=0.5):
+        self.pool_size = pool_size
+        self.keep_alive = keep_alive
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            pool_size=config['PROVIDER_POOL_SIZE'],
+            keep_alive=config['PROVIDER_KEEP_ALIVE'],
+            connect_timeout=config['PROVIDER_CONNECT_TIMEOUT'],
+            read_timeout=config['PROVIDER_READ_TIMEOUT'],
+            max_retries=config['PROVIDER_MAX_RETRIES'],
+            retry_backoff=config['PROVIDER_RETRY_BACKOFF'],
+        )
+
+    def post(self, provider, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        if not self.keep_alive:
+            kwargs['headers'] = dict(kwargs.get('headers') or {}, Connection='close')
+        return self.session(provider).post(provider.api_url, **kwargs)
+
+    def session(self, provider):
+        with self._lock:
+            entry = self._sessions.get(provider.id)
+            if entry and entry[0] == provider.api_url:
+                return entry[1]
+            if entry:
+                entry[1].close()
+            session = self._build_session()
+            self._sessions[provider.id] = (provider.api_url, session)
+            return session
+
+    def invalidate(self, provider_id=None):
+        """Close the pooled session for one provider, or for all providers."""
+        with self._lock:
+            if provider_id is None:
+                entries = list(self._sessions.values())
+                self._sessions.clear()
+            else:
+                entry = self._sessions.pop(provider_id, None)
+                entries = [entry] if entry else []
+        for _, session in entries:
+            session.close()
+
+    def _build_session(self):
+        # Completions are not idempotent, so only retry when the provider refused
+        # the request (429/5xx) or the connection could not be made, never after
+        # a read timeout.
+        retry = Retry(
+            total=self.max_retries,
+            connect=self.max_retries,
+            read=0,
+            status=self.max_retries,
+            status_forcelist=self.RETRY_STATUSES,
+            allowed_methods=frozenset(['POST']),
+            backoff_factor=self.retry_backoff,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size, max_retries=retry)
+        session = requests.Session()
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
@@ -0,0 +1,99 @@
+import hashlib
+import json
+import sqlite3
+import time
+from contextlib import contextmanager
+
+
+class ResponseCache:
+    """Content-addressed cache of AI provider responses.
+
+    Entries live in a small SQLite file so every gunicorn worker shares them.
+    Keys hash the provider and the full request payload (model, temperature and
+    messages). Entries expire after ttl seconds, and the least recently used
+    ones are evicted once max_entries is exceeded. Only low-temperature calls
+    are cached unless the caller opts in.
+    """
+
+    def __init__(self, path, ttl=86400, max_entries=10000, max_temperature=0.2, enabled=True):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_temperature = max_temperature
+        self.enabled = enabled
+        self._initialized = False
+
+    @classmethod
+    def from_config(cls, config, default_path):
+        return cls(
+            config['RESPONSE_CACHE_PATH'] or default_path,
+            ttl=config['RESPONSE_CACHE_TTL'],
+            max_entries=config['RESPONSE_CACHE_MAX_ENTRIES'],
+            max_temperature=config['RESPONSE_CACHE_MAX_TEMPERATURE'],
+            enabled=config['RESPONSE_CACHE_ENABLED'],
+        )
+
+    def applies(self, temperature, opt_in=None):
+        """Whether a call at this temperature should use the cache.
+
+        opt_in=True forces caching and opt_in=False disables it for the call.
+        """
+        if not self.enabled or opt_in is False:
+            return False
+        return bool(opt_in) or (temperature is not None and temperature <= self.max_temperature)
+
+    def key(self, provider, payload):
+        # Streamed and buffered requests for the same prompt share an entry
+        payload = {k: v for k, v in payload.items() if k != 'stream'}
+        raw = json.dumps({"provider": provider.id, "api_url": provider.api_url, "payload": payload}, sort_keys=True)
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute("SELECT value FROM response_cache WHERE key = ? AND created_at > ?",
+                               (key, now - self.ttl)).fetchone()
+            if row:
+                conn.execute("UPDATE response_cache SET last_access = ? WHERE key = ?", (now, key))
+            self._count(conn, 'hits' if row else 'misses')
+        return row[0] if row else None
+
+    def set(self, key, value):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO response_cache (key, value, created_at, last_access) VALUES (?, ?, ?, ?)",
+                         (key, value, now, now))
+            conn.execute("DELETE FROM response_cache WHERE created_at <= ?", (now - self.ttl,))
+            conn.execute("""DELETE FROM response_cache WHERE key IN (
+                                SELECT key FROM response_cache ORDER BY last_access
+                                LIMIT max(0, (SELECT COUNT(*) FROM response_cache) - ?))""",
+                         (self.max_entries,))
+
+    def stats(self):
+        with self._connect() as conn:
+            counters = dict(conn.execute("SELECT name, value FROM response_cache_stats").fetchall())
+            entries = conn.execute("SELECT COUNT(*) FROM response_cache").fetchone()[0]
+        return {"hits": counters.get('hits', 0), "misses": counters.get('misses', 0), "entries": entries}
+
+    def _count(self, conn, name):
+        conn.execute("""INSERT INTO response_cache_stats (name, value) VALUES (?, 1)
+                        ON CONFLICT(name) DO UPDATE SET value = value + 1""", (name,))
+
+    @contextmanager
+    def _connect(self):
+        # A short-lived connection per operation is cheap for SQLite and is safe
+        # across threads, greenlets and forked workers.
+        conn = sqlite3.connect(self.path, timeout=5)
+        try:
+            if not self._initialized:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("""CREATE TABLE IF NOT EXISTS response_cache (
+                                    key TEXT PRIMARY KEY, value TEXT NOT NULL,
+                                    created_at REAL NOT NULL, last_access REAL NOT NULL)""")
+                conn.execute("CREATE INDEX IF NOT EXISTS ix_response_cache_last_access ON response_cache (last_access)")
+                conn.execute("CREATE TABLE IF NOT EXISTS response_cache_stats (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+                self._initialized = True
+            with conn:
+                yield conn
+        finally:
+            conn.close()
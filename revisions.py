@@ -0,0 +1,114 @@
+import difflib
+import hashlib
+import json
+
+from sqlalchemy.orm import defer
+
+from models import (db, compress_text, decompress_text, ArtifactRevision, CodingPlan, ContentBlob,
+                    ProjectHLD, ProjectJournal, ProjectMasterLLD, ProjectScope)
+
+# Artifacts kept as a single row per project, which every save overwrites
+REVISIONED_ARTIFACTS = {
+    'scope': ProjectScope,
+    'hld': ProjectHLD,
+    'master_lld': ProjectMasterLLD,
+    'coding_plan': CodingPlan,
+    'journal': ProjectJournal,
+}
+ARTIFACT_KINDS = {model: kind for kind, model in REVISIONED_ARTIFACTS.items()}
+
+
+def make_delta(old, new):
+    """Line delta turning old into new: [start, end] copies old lines, a string is inserted text."""
+    old_lines = old.splitlines(keepends=True)
+    new_lines = new.splitlines(keepends=True)
+    delta = []
+    for tag, i1, i2, j1, j2 in difflib.SequenceMatcher(None, old_lines, new_lines).get_opcodes():
+        if tag == 'equal':
+            delta.append([i1, i2])
+        elif j2 > j1:
+            delta.append(''.join(new_lines[j1:j2]))
+    return delta
+
+
+def apply_delta(old, delta):
+    old_lines = old.splitlines(keepends=True)
+    return ''.join(''.join(old_lines[op[0]:op[1]]) if isinstance(op, list) else op for op in delta)
+
+
+class RevisionStore:
+    """Append-only version history of the single-row project artifacts.
+
+    Every save appends a revision holding a line delta against the previous
+    revision. Every snapshot_interval-th revision, and any revision whose delta
+    would be no smaller than its text, is stored as a full snapshot instead, so
+    any revision is rebuilt from the nearest snapshot plus fewer than
+    snapshot_interval deltas.
+    """
+
+    def __init__(self, snapshot_interval=50):
+        self.snapshot_interval = max(1, snapshot_interval)
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(snapshot_interval=config['REVISION_SNAPSHOT_INTERVAL'])
+
+    def record(self, artifact):
+        """Append a revision with an artifact row's current content.
+
+        Call after assigning the content and before committing, so the revision
+        is saved in the same transaction. Does nothing for models without
+        history, empty content, or content equal to the latest revision.
+        """
+        kind = ARTIFACT_KINDS.get(type(artifact))
+        content = artifact.content
+        if kind is None or content is None:
+            return None
+        content_hash = hashlib.sha256(content.encode('utf-8')).hexdigest()
+        latest = (self._revisions(artifact.project_id, kind).options(defer(ArtifactRevision.data))
+                  .order_by(ArtifactRevision.revision.desc()).first())
+        if latest and latest.content_hash == content_hash:
+            return latest
+
+        number = latest.revision + 1 if latest else 1
+        codec = ContentBlob.codec_name
+        data = compress_text(codec, content)
+        snapshot = True
+        if latest and (number - 1) % self.snapshot_interval:
+            _, previous = self.load(artifact.project_id, kind, latest.revision)
+            delta = compress_text(codec, json.dumps(make_delta(previous, content), separators=(',', ':')))
+            if len(delta) < len(data):
+                data, snapshot = delta, False
+
+        # A concurrent save of the same artifact fails on the unique
+        # (project_id, artifact, revision) index rather than forking the history
+        revision = ArtifactRevision(project_id=artifact.project_id, artifact=kind, revision=number,
+                                    snapshot=snapshot, codec=codec, data=data, size=len(content),
+                                    content_hash=content_hash)
+        db.session.add(revision)
+        return revision
+
+    def history(self, project_id, kind, limit, offset=0):
+        """Revisions newest first, without their data."""
+        return (self._revisions(project_id, kind).options(defer(ArtifactRevision.data))
+                .order_by(ArtifactRevision.revision.desc()).limit(limit).offset(offset).all())
+
+    def load(self, project_id, kind, number):
+        """Return (revision, text) for one revision, or None if it doesn't exist."""
+        base = (db.session.query(ArtifactRevision.revision)
+                .filter_by(project_id=project_id, artifact=kind, snapshot=True)
+                .filter(ArtifactRevision.revision <= number)
+                .order_by(ArtifactRevision.revision.desc()).limit(1).scalar_subquery())
+        rows = (self._revisions(project_id, kind)
+                .filter(ArtifactRevision.revision.between(base, number))
+                .order_by(ArtifactRevision.revision).all())
+        if not rows or rows[-1].revision != number:
+            return None
+        text = None
+        for row in rows:
+            body = decompress_text(row.codec, row.data)
+            text = body if row.snapshot else apply_delta(text, json.loads(body))
+        return rows[-1], text
+
+    def _revisions(self, project_id, kind):
+        return ArtifactRevision.query.filter_by(project_id=project_id, artifact=kind)
@@ -0,0 +1,127 @@
+import html
+import re
+
+from sqlalchemy import bindparam, text
+
+from models import db, replace_trigger
+
+# Text of a BlobContentMixin row, whether stored inline or in content_blob
+CONTENT = "COALESCE({row}.content, (SELECT blob_text(codec, data) FROM content_blob WHERE hash = {row}.content_hash))"
+
+# (kind, table, indexed text). The position of each entry is part of the FTS
+# rowid (source id * ROWID_STRIDE + position), so only ever append to this list.
+SEARCH_SOURCES = [
+    ('conversation', 'conversation', CONTENT),
+    ('journal', 'project_journal', CONTENT),
+    ('document', 'project_document', "{row}.doc_type || char(10) || COALESCE(" + CONTENT + ", '')"),
+    ('scope', 'project_scope', CONTENT),
+    ('hld', 'project_hld', CONTENT),
+    ('lld', 'project_lld', "{row}.component_name || char(10) || COALESCE(" + CONTENT + ", '')"),
+    ('master_lld', 'project_master_lld', CONTENT),
+    ('coding_plan', 'coding_plan', CONTENT),
+    ('unit_test', 'unit_test', "{row}.component_name || char(10) || COALESCE(" + CONTENT + ", '')"),
+]
+SEARCH_KINDS = [kind for kind, _, _ in SEARCH_SOURCES]
+ROWID_STRIDE = 16
+# Private-use characters marking matches in snippets until the text is HTML-escaped
+MARK_START, MARK_END = '\ue000', '\ue001'
+
+
+def ensure_search_index():
+    """Create the FTS5 index and its sync triggers, backfilling on first run.
+
+    The index is a single FTS5 table over every searchable text column. Triggers
+    on the source tables keep it in sync, including for bulk inserts and raw SQL
+    that bypass the ORM. project_id is an indexed column so that project
+    filters are answered by the index rather than by filtering the matches.
+    Triggers whose definition differs are replaced, so changes to
+    SEARCH_SOURCES reach existing databases. Run inside schema_lock().
+    Returns False when the database is not SQLite or lacks FTS5.
+    """
+    if db.engine.dialect.name != 'sqlite':
+        return False
+    connection = db.session.connection()
+    exists = connection.execute(text(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'search_index'")).first()
+    if not exists:
+        try:
+            with db.session.begin_nested():
+                connection.execute(text(
+                    "CREATE VIRTUAL TABLE search_index USING fts5("
+                    "content, project_id, kind UNINDEXED, source_id UNINDEXED)"))
+        except Exception:
+            return False
+        # Rank on the content column only
+        connection.execute(text("INSERT INTO search_index (search_index, rank) VALUES ('rank', 'bm25(1.0, 0.0)')"))
+
+    for position, (kind, table, expression) in enumerate(SEARCH_SOURCES):
+        def index_row(row):
+            return (f"INSERT INTO search_index (rowid, content, project_id, kind, source_id) VALUES "
+                    f"({row}.id * {ROWID_STRIDE} + {position}, COALESCE({expression.format(row=row)}, ''), "
+                    f"{row}.project_id, '{kind}', {row}.id);")
+
+        def unindex_row(row):
+            return f"DELETE FROM search_index WHERE rowid = {row}.id * {ROWID_STRIDE} + {position};"
+
+        replace_trigger(connection, f"search_{table}_insert",
+                        f"CREATE TRIGGER search_{table}_insert AFTER INSERT ON {table} BEGIN {index_row('new')} END")
+        replace_trigger(connection, f"search_{table}_delete",
+                        f"CREATE TRIGGER search_{table}_delete AFTER DELETE ON {table} BEGIN {unindex_row('old')} END")
+        changed = ' OR '.join(f"old.{column} IS NOT new.{column}"
+                              for column in dict.fromkeys(re.findall(r'\{row\}\.(\w+)', expression) + ['project_id']))
+        replace_trigger(connection, f"search_{table}_update",
+                        f"CREATE TRIGGER search_{table}_update AFTER UPDATE ON {table} WHEN {changed} "
+                        f"BEGIN {unindex_row('old')} {index_row('new')} END")
+        if not exists:
+            connection.execute(text(
+                f"INSERT INTO search_index (rowid, content, project_id, kind, source_id) "
+                f"SELECT id * {ROWID_STRIDE} + {position}, COALESCE({expression.format(row=table)}, ''), "
+                f"project_id, '{kind}', id FROM {table}"))
+    return True
+
+
+def match_expression(query):
+    """Turn free text into a safe FTS5 query: every term must match, "term*" is a prefix search."""
+    terms = []
+    for term in re.findall(r'"[^"]+"|\S+', query):
+        prefix = term.endswith('*') and not term.startswith('"')
+        term = term.strip('"*').replace('"', '""')
+        if term:
+            terms.append(f'"{term}"' + ('*' if prefix else ''))
+    return ' '.join(terms)
+
+
+def highlight(snippet):
+    """HTML-escape a snippet's text, then turn its match markers into <mark> tags."""
+    return html.escape(snippet).replace(MARK_START, '<mark>').replace(MARK_END, '</mark>')
+
+
+def search(query, project_id=None, kinds=None, limit=20, offset=0):
+    """Ranked matches as dicts, best first, with HTML-escaped, <mark>-highlighted snippets.
+
+    Fetches one extra row so callers can tell whether another page exists.
+    """
+    terms = match_expression(query)
+    if not terms:
+        return []
+    match = f"content : ({terms})"
+    if project_id is not None:
+        match = f'project_id : "{int(project_id)}" AND {match}'
+
+    sql = ("SELECT kind, source_id, project_id, rank, "
+           "snippet(search_index, 0, :mark_start, :mark_end, '…', 16) AS snippet "
+           "FROM search_index WHERE search_index MATCH :match "
+           # Soft-deleted projects disappear before their rows are purged
+           "AND project_id NOT IN (SELECT id FROM project WHERE deleted_at IS NOT NULL)")
+    params = {'match': match, 'mark_start': MARK_START, 'mark_end': MARK_END, 'limit': limit + 1, 'offset': offset}
+    statement = text(sql + (" AND kind IN :kinds" if kinds else "") + " ORDER BY rank LIMIT :limit OFFSET :offset")
+    if kinds:
+        statement = statement.bindparams(bindparam('kinds', expanding=True))
+        params['kinds'] = list(kinds)
+    return [{
+        "kind": row.kind,
+        "id": row.source_id,
+        "project_id": int(row.project_id),
+        "score": -row.rank,
+        "snippet": highlight(row.snippet),
+    } for row in db.session.execute(statement, params)]
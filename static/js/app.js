@@ -16,9 +16,21 @@ document.addEventListener('DOMContentLoaded', () => {
     const agentConfigList = document.getElementById('agent-config-list');
     const providerSelect = document.getElementById('provider-select');
 
+    // Fetch every page of the project list (the server pages it and sends an
+    // ETag, so unchanged pages come back from the browser cache after a 304)
+    function fetchAllProjects(offset = 0, projects = []) {
+        return fetch(`/api/projects?offset=${offset}`)
+            .then(response => {
+                const nextOffset = response.headers.get('X-Next-Offset');
+                return response.json().then(page => {
+                    projects.push(...page);
+                    return nextOffset ? fetchAllProjects(nextOffset, projects) : projects;
+                });
+            });
+    }
+
     function loadProjects() {
-        fetch('/api/projects')
-            .then(response => response.json())
+        fetchAllProjects()
             .then(projects => {
                 projectList.innerHTML = '';
                 projects.forEach(project => {
@@ -127,12 +139,10 @@ document.addEventListener('DOMContentLoaded', () => {
         chatInterface.style.display = 'block';
         documentDisplay.style.display = 'block';
         clearChatMessages();
-        loadProjectDocuments(projectId);
-        loadChatHistory(projectId);
 
-        // Fetch and set the project name
-        fetch(`/api/projects/${projectId}`)
-            .then(response => response.json())
+        // Load the project, its documents and chat history in one request, then
+        // apply changes pushed by the server instead of re-fetching
+        openProjectEvents(projectId, loadProjectBundle(projectId))
             .then(project => {
                 document.getElementById('project-name').textContent = `${project.name}`;
                 document.title = `Chat with AI - ${project.name}`;
@@ -152,79 +162,137 @@ document.addEventListener('DOMContentLoaded', () => {
         .catch(error => console.error('Error clearing chat history:', error));
     }
 
-    function loadProjectDocuments(projectId) {
-        // Load and display the project journal
-        // Fetch project name
-        fetch(`/api/projects/${projectId}`)
+    function loadProjectBundle(projectId) {
+        return fetch(`/api/projects/${projectId}/bundle`)
             .then(response => response.json())
-            .then(project => {
-                const projectName = project.name;
-
-                // Load and display the project journal
-                fetch(`/api/projects/${projectId}/journal`)
-                    .then(response => response.json())
-                    .then(data => {
-                        const journalTab = document.getElementById('tab1');
-                        journalTab.innerHTML = `<h3>Project Journal</h3><pre>${data.content}</pre>`;
-                    });
+            .then(bundle => {
+                renderProjectDocuments(bundle);
+                renderChatHistory(bundle.chat_history, bundle.chat_history_next_before_id);
+                return bundle.project;
+            })
+            .catch(error => {
+                console.error('Error fetching project details:', error);
+                throw error;
+            });
+    }
 
-                // Load and display the project scope
-                fetch(`/api/projects/${projectId}/scope`)
-                    .then(response => response.json())
-                    .then(data => {
-                        const scopeTab = document.getElementById('tab2');
-                        scopeTab.innerHTML = `<h3>${projectName} - Project Scope</h3><pre>${data.content}</pre>`;
-                    });
+    function renderProjectDocuments(bundle) {
+        ['journal', 'scope', 'hld', 'lld', 'master_lld', 'coding_plan', 'unit_tests'].forEach(field => renderArtifact(field, bundle));
+    }
 
-                // Load and display the project HLD
-                fetch(`/api/projects/${projectId}/hld`)
-                    .then(response => response.json())
-                    .then(data => {
-                        const hldTab = document.getElementById('tab3');
-                        hldTab.innerHTML = `<h3>${projectName} - High-Level Design (HLD)</h3><pre>${data.content}</pre>`;
-                    });
+    function renderArtifact(field, bundle) {
+        const projectName = bundle.project.name;
+
+        if (field === 'journal') {
+            // Display the project journal
+            const journalTab = document.getElementById('tab1');
+            journalTab.innerHTML = `<h3>Project Journal</h3><pre>${bundle.journal.content}</pre>`;
+        } else if (field === 'scope') {
+            // Display the project scope
+            const scopeTab = document.getElementById('tab2');
+            scopeTab.innerHTML = `<h3>${projectName} - Project Scope</h3><pre>${bundle.scope.content}</pre>`;
+        } else if (field === 'hld') {
+            // Display the project HLD
+            const hldTab = document.getElementById('tab3');
+            hldTab.innerHTML = `<h3>${projectName} - High-Level Design (HLD)</h3><pre>${bundle.hld.content}</pre>`;
+        } else if (field === 'lld') {
+            // Display the project LLDs
+            const lldTab = document.getElementById('tab4');
+            lldTab.innerHTML = `<h3>${projectName} - Low-Level Designs (LLDs)</h3>`;
+            bundle.lld.forEach(lld => {
+                lldTab.innerHTML += `<h4>${lld.component_name}</h4><pre>${lld.content}</pre>`;
+            });
+        } else if (field === 'master_lld') {
+            // Display the project Master LLD
+            const masterLldTab = document.getElementById('tab5');
+            masterLldTab.innerHTML = `<h3>${projectName} - Master LLD</h3><pre>${bundle.master_lld.content}</pre>`;
+        } else if (field === 'coding_plan') {
+            // Display the coding plan
+            const codingPlanTab = document.getElementById('tab6');
+            codingPlanTab.innerHTML = `<h3>${projectName} - Coding Plan</h3><pre>${bundle.coding_plan.content}</pre>`;
+        } else if (field === 'unit_tests') {
+            // Display the unit tests
+            const unitTestsTab = document.getElementById('tab7');
+            unitTestsTab.innerHTML = `<h3>${projectName} - Unit Tests</h3>`;
+            bundle.unit_tests.forEach(test => {
+                unitTestsTab.innerHTML += `<h4>${test.component_name}</h4><pre>${test.content}</pre>`;
+            });
+        }
+    }
 
-                // Load and display the project LLDs
-                fetch(`/api/projects/${projectId}/lld`)
-                    .then(response => response.json())
-                    .then(data => {
-                        const lldTab = document.getElementById('tab4');
-                        lldTab.innerHTML = `<h3>${projectName} - Low-Level Designs (LLDs)</h3>`;
-                        data.forEach(lld => {
-                            lldTab.innerHTML += `<h4>${lld.component_name}</h4><pre>${lld.content}</pre>`;
-                        });
-                    });
+    // Live updates for the open project. Events that arrive before the bundle
+    // has been rendered wait for it; chat messages already on screen (from the
+    // bundle or this tab's own sends) are recognised by id and skipped. The
+    // server turns streams off under sync workers; the journal is then polled.
+    const eventStreamsEnabled = document.body.dataset.eventStreams === 'true';
+    let projectEvents = null;
+    let shownConversationIds = new Set();
+    let pendingSend = Promise.resolve();
+
+    function closeProjectEvents() {
+        if (projectEvents) {
+            projectEvents.close();
+            projectEvents = null;
+        }
+    }
 
-                // Load and display the project Master LLD
-                fetch(`/api/projects/${projectId}/master-lld`)
-                    .then(response => response.json())
-                    .then(data => {
-                        const masterLldTab = document.getElementById('tab5');
-                        masterLldTab.innerHTML = `<h3>${projectName} - Master LLD</h3><pre>${data.content}</pre>`;
-                    });
+    function openProjectEvents(projectId, bundleLoaded) {
+        closeProjectEvents();
+        shownConversationIds = new Set();
+        if (!eventStreamsEnabled) {
+            return bundleLoaded;
+        }
+        const source = new EventSource(`/api/projects/${projectId}/events`);
+        projectEvents = source;
+        const ready = bundleLoaded.catch(() => null);
+
+        const on = (eventName, handler) => {
+            source.addEventListener(eventName, event => {
+                const data = JSON.parse(event.data);
+                ready.then(() => {
+                    if (projectEvents === source && projectId === currentProjectId) {
+                        handler(data);
+                    }
+                });
+            });
+        };
 
-                // Load and display the coding plan
-                fetch(`/api/projects/${projectId}/coding-plan`)
+        on('conversation', message => {
+            pendingSend.then(() => {
+                if (!shownConversationIds.has(message.id)) {
+                    shownConversationIds.add(message.id);
+                    displayMessage(message);
+                }
+            });
+        });
+        on('journal', journal => {
+            if (journal.status === 'fresh') {
+                fetch(`/api/projects/${projectId}/journal`)
                     .then(response => response.json())
-                    .then(data => {
-                        const codingPlanTab = document.getElementById('tab6');
-                        codingPlanTab.innerHTML = `<h3>${projectName} - Coding Plan</h3><pre>${data.content}</pre>`;
-                    });
+                    .then(data => updateJournalContent(data.content))
+                    .catch(error => console.error('Error fetching project journal:', error));
+            }
+        });
+        on('artifact', change => {
+            if (change.artifact === 'documents') {
+                return;
+            }
+            fetch(`/api/projects/${projectId}/bundle?fields=project,${change.artifact}`)
+                .then(response => response.json())
+                .then(bundle => renderArtifact(change.artifact, bundle))
+                .catch(error => console.error('Error fetching project artifact:', error));
+        });
+        on('project', project => {
+            if (project.deleted) {
+                navProjects.click();
+            } else {
+                document.getElementById('project-name').textContent = project.name;
+            }
+        });
+        // Events were pruned before they could be replayed; reload everything
+        on('reset', () => loadProjectBundle(projectId));
 
-                // Load and display the unit tests
-                fetch(`/api/projects/${projectId}/unit-tests`)
-                    .then(response => response.json())
-                    .then(data => {
-                        const unitTestsTab = document.getElementById('tab7');
-                        unitTestsTab.innerHTML = `<h3>${projectName} - Unit Tests</h3>`;
-                        data.forEach(test => {
-                            unitTestsTab.innerHTML += `<h4>${test.component_name}</h4><pre>${test.content}</pre>`;
-                        });
-                    });
-            })
-            .catch(error => {
-                console.error('Error fetching project details:', error);
-            });
+        return bundleLoaded;
     }
 
     // Tab functionality
@@ -276,44 +344,106 @@ document.addEventListener('DOMContentLoaded', () => {
             displayMessage({ agent_type: 'user', content: message });
             chatInput.value = '';
 
-            // Send message to AI
-            fetch('/api/chat', {
+            // Render the reply token by token as the AI streams it back
+            const projectId = currentProjectId;
+            const replyElement = displayMessage({ agent_type: 'Project Assistant', content: '' });
+            const replyContent = replyElement.querySelector('.message-content');
+            let replyText = '';
+            // Pushed copies of this turn's messages wait until its ids are known
+            let sendFinished;
+            pendingSend = new Promise(resolve => { sendFinished = resolve; });
+
+            const showReply = (content) => {
+                replyContent.innerHTML = formatMessageContent(content);
+                scrollChatToBottom();
+            };
+
+            const handleEvent = (eventName, data) => {
+                if (eventName === 'error') {
+                    console.error('Error:', data.error);
+                    showReply(`Error: ${data.error}`);
+                } else if (eventName === 'done') {
+                    showReply(data.response);
+                    data.conversation_ids.forEach(id => shownConversationIds.add(id));
+                    // The journal is regenerated in the background: pushed when ready, or polled without event streams
+                    if (!eventStreamsEnabled) {
+                        pollJournal(projectId);
+                    }
+                } else {
+                    replyText += data.token;
+                    showReply(replyText);
+                }
+            };
+
+            fetch('/api/chat/stream', {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json',
                 },
-                body: JSON.stringify({ project_id: currentProjectId, message: message }),
+                body: JSON.stringify({ project_id: projectId, message: message }),
             })
             .then(response => {
                 if (!response.ok) {
-                    throw new Error(`HTTP error! status: ${response.status}`);
-                }
-                return response.json();
-            })
-            .then(data => {
-                if (data.error) {
-                    console.error('Error:', data.error);
-                    displayMessage({ agent_type: 'Project Assistant', content: `Error: ${data.error}` });
-                } else {
-                    displayMessage({ agent_type: 'Project Assistant', content: data.response });
-                    // Update the journal content
-                    updateJournalContent(data.journal_content);
+                    return response.json().then(data => {
+                        throw new Error(data.error || `HTTP error! status: ${response.status}`);
+                    });
                 }
-                // Scroll to bottom after displaying the message
-                scrollChatToBottom();
+                const reader = response.body.getReader();
+                const decoder = new TextDecoder();
+                let buffer = '';
+
+                const read = () => reader.read().then(({ done, value }) => {
+                    if (done) {
+                        return;
+                    }
+                    buffer += decoder.decode(value, { stream: true });
+                    const events = buffer.split('\n\n');
+                    buffer = events.pop();
+                    events.forEach(rawEvent => {
+                        let eventName = 'message';
+                        let data = '';
+                        rawEvent.split('\n').forEach(line => {
+                            if (line.startsWith('event:')) {
+                                eventName = line.slice(6).trim();
+                            } else if (line.startsWith('data:')) {
+                                data += line.slice(5).trim();
+                            }
+                        });
+                        if (data) {
+                            handleEvent(eventName, JSON.parse(data));
+                        }
+                    });
+                    return read();
+                });
+                return read();
             })
             .catch(error => {
                 console.error('Error:', error);
-                displayMessage({ agent_type: 'Project Assistant', content: `An error occurred: ${error.message}` });
-                // Scroll to bottom even if there's an error
-                scrollChatToBottom();
-            });
+                showReply(`An error occurred: ${error.message}`);
+            })
+            .finally(() => sendFinished());
         }
     }
 
     let currentProjectName = '';
     let currentProjectDescription = '';
 
+    function pollJournal(projectId, attempt = 0) {
+        fetch(`/api/projects/${projectId}/journal`)
+            .then(response => response.json())
+            .then(data => {
+                if (projectId !== currentProjectId) {
+                    return;
+                }
+                if (data.status === 'pending' && attempt < 60) {
+                    setTimeout(() => pollJournal(projectId, attempt + 1), 2000);
+                } else if (data.status === 'fresh') {
+                    updateJournalContent(data.content);
+                }
+            })
+            .catch(error => console.error('Error polling project journal:', error));
+    }
+
     function updateJournalContent(content) {
         const journalTab = document.getElementById('tab1');
         journalTab.innerHTML = `<h3>Project Journal</h3><pre>${content}</pre>`;
@@ -400,13 +530,9 @@ document.addEventListener('DOMContentLoaded', () => {
         documentDisplay.style.display = 'block';
         settingsSection.style.display = 'none';
         clearChatMessages();
-        loadProjectDocuments(projectId);
-        loadChatHistory(projectId);
-        chatMessages.scrollTop = chatMessages.scrollHeight;
 
-        // Fetch and set the project name
-        fetch(`/api/projects/${projectId}`)
-            .then(response => response.json())
+        // Load the project, its documents and chat history in one request
+        openProjectEvents(projectId, loadProjectBundle(projectId))
             .then(project => {
                 document.getElementById('project-name').textContent = project.name;
                 document.getElementById('project-documents-title').textContent = `Project - ${project.name}`;
@@ -415,8 +541,7 @@ document.addEventListener('DOMContentLoaded', () => {
 
     // Add this function to load projects and select the last active project
     function loadProjectsAndSelectLast() {
-        fetch('/api/projects')
-            .then(response => response.json())
+        fetchAllProjects()
             .then(projects => {
                 projectList.innerHTML = '';
                 projects.forEach(project => {
@@ -449,13 +574,9 @@ document.addEventListener('DOMContentLoaded', () => {
         documentDisplay.style.display = 'block';
         settingsSection.style.display = 'none';
         clearChatMessages();
-        loadProjectDocuments(projectId);
-        loadChatHistory(projectId);
-        debugChatHistory(projectId);
 
-        // Fetch project data and update the interface
-        fetch(`/api/projects/${projectId}`)
-            .then(response => response.json())
+        // Load the project, its documents and chat history in one request
+        openProjectEvents(projectId, loadProjectBundle(projectId))
             .then(project => {
                 currentProjectName = project.name;
                 currentProjectDescription = project.description || 'No description available.';
@@ -469,40 +590,63 @@ document.addEventListener('DOMContentLoaded', () => {
         chatMessages.innerHTML = '';
     }
 
-    function loadChatHistory(projectId) {
-        fetch(`/api/projects/${projectId}/chat_history`)
-            .then(response => response.json())
-            .then(history => {
-                history.forEach(message => {
-                    displayMessage(message);
-                });
-            })
-            .catch(error => {
-                console.error('Error loading chat history:', error);
-            });
+    // Cursor for the next page of older chat messages, null once everything is loaded
+    let chatHistoryCursor = null;
+    let loadingOlderChatHistory = false;
+
+    function renderChatHistory(history, nextBeforeId) {
+        // Clear the chat messages container before adding new messages
+        chatMessages.innerHTML = '';
+        chatHistoryCursor = nextBeforeId || null;
+        history.forEach(message => {
+            shownConversationIds.add(message.id);
+            displayMessage(message);
+        });
+        chatMessages.scrollTop = chatMessages.scrollHeight;
     }
 
-    function loadChatHistory(projectId) {
-        console.log(`Loading chat history for project ID: ${projectId}`);
-        fetch(`/api/projects/${projectId}/chat_history`)
+    function loadOlderChatHistory() {
+        if (!chatHistoryCursor || loadingOlderChatHistory) {
+            return;
+        }
+        loadingOlderChatHistory = true;
+        const projectId = currentProjectId;
+        let nextBeforeId = null;
+
+        fetch(`/api/projects/${projectId}/chat_history?before_id=${chatHistoryCursor}`)
             .then(response => {
-                console.log('Chat history response status:', response.status);
+                nextBeforeId = response.headers.get('X-Next-Before-Id');
                 return response.json();
             })
             .then(history => {
-                console.log('Received chat history:', history);
-                // Clear the chat messages container before adding new messages
-                chatMessages.innerHTML = '';
+                if (projectId !== currentProjectId) {
+                    return;
+                }
+                chatHistoryCursor = nextBeforeId;
+
+                // Prepend the older messages while keeping the current scroll position
+                const firstMessage = chatMessages.firstChild;
+                const previousHeight = chatMessages.scrollHeight;
                 history.forEach(message => {
-                    displayMessage(message);
+                    shownConversationIds.add(message.id);
+                    chatMessages.insertBefore(displayMessage(message), firstMessage);
                 });
-                chatMessages.scrollTop = chatMessages.scrollHeight;
+                chatMessages.scrollTop = chatMessages.scrollHeight - previousHeight;
             })
             .catch(error => {
-                console.error('Error loading chat history:', error);
+                console.error('Error loading older chat history:', error);
+            })
+            .finally(() => {
+                loadingOlderChatHistory = false;
             });
     }
 
+    chatMessages.addEventListener('scroll', () => {
+        if (chatMessages.scrollTop < 50) {
+            loadOlderChatHistory();
+        }
+    });
+
     function displayMessage(message) {
         console.log('Displaying message:', message);
         const messageElement = document.createElement('div');
@@ -533,6 +677,8 @@ document.addEventListener('DOMContentLoaded', () => {
         console.log('Current chat messages:', chatMessages.innerHTML);
         console.log('Number of messages in chat window:', chatMessages.children.length);
         scrollChatToBottom();
+
+        return messageElement;
     }
 
     function formatMessageContent(content) {
@@ -552,21 +698,10 @@ document.addEventListener('DOMContentLoaded', () => {
         return content;
     }
 
-    // Add this function to debug the chat history
-    function debugChatHistory(projectId) {
-        fetch(`/api/projects/${projectId}/chat_history`)
-            .then(response => response.json())
-            .then(history => {
-                console.log('Full chat history:', JSON.stringify(history, null, 2));
-            })
-            .catch(error => {
-                console.error('Error fetching chat history for debugging:', error);
-            });
-    }
-
     navProjects.addEventListener('click', (e) => {
         e.preventDefault();
         currentProjectId = null;
+        closeProjectEvents();
         chatInterface.style.display = 'none';
         documentDisplay.style.display = 'none';
         settingsSection.style.display = 'none';
@@ -906,56 +1041,76 @@ document.addEventListener('DOMContentLoaded', () => {
         });
     });
 
-    // Backup settings
+    // Backup settings (streamed by the server straight to the download)
     document.getElementById('backup-settings').addEventListener('click', () => {
-        fetch('/api/backup')
-            .then(response => response.json())
-            .then(data => {
-                const blob = new Blob([JSON.stringify(data, null, 2)], {type: 'application/json'});
-                const url = URL.createObjectURL(blob);
-                const a = document.createElement('a');
-                a.href = url;
-                a.download = 'ai_project_manager_backup.json';
-                document.body.appendChild(a);
-                a.click();
-                document.body.removeChild(a);
-                URL.revokeObjectURL(url);
-            })
-            .catch(error => {
-                console.error('Error:', error);
-                alert('Failed to backup settings. Please try again.');
-            });
+        const a = document.createElement('a');
+        a.href = '/api/export?scope=settings';
+        a.download = '';
+        document.body.appendChild(a);
+        a.click();
+        document.body.removeChild(a);
     });
 
-    // Restore settings
+    // Restore settings from an NDJSON export (optionally gzipped) or a legacy JSON backup.
+    // An NDJSON restore that fails part way is resumed by choosing the same file again.
+    let interruptedRestore = null;
+
+    function importSettings(file, mode) {
+        const query = mode ? `?${mode}=1` : '';
+        return fetch(`/api/import${query}`, {
+            method: 'POST',
+            headers: {
+                'Content-Type': file.name.endsWith('.gz') ? 'application/gzip' : 'application/x-ndjson',
+            },
+            body: file,
+        })
+        .then(response => response.json().then(data => ({ status: response.status, data })));
+    }
+
     document.getElementById('restore-settings').addEventListener('click', () => {
         const fileInput = document.createElement('input');
         fileInput.type = 'file';
-        fileInput.accept = '.json';
+        fileInput.accept = '.ndjson,.gz,.json';
         fileInput.onchange = (event) => {
             const file = event.target.files[0];
-            const reader = new FileReader();
-            reader.onload = (e) => {
-                const contents = e.target.result;
-                fetch('/api/restore', {
+            const fileKey = `${file.name}:${file.size}:${file.lastModified}`;
+            let restore;
+            if (file.name.endsWith('.json')) {
+                restore = fetch('/api/restore', {
                     method: 'POST',
-                    headers: {
-                        'Content-Type': 'application/json',
-                    },
-                    body: contents,
+                    headers: { 'Content-Type': 'application/json' },
+                    body: file,
                 })
                 .then(response => response.json())
-                .then(data => {
-                    alert(data.message);
-                    loadProviders();
-                    loadAgentConfigs();
-                })
-                .catch(error => {
-                    console.error('Error:', error);
-                    alert('Failed to restore settings. Please try again.');
-                });
-            };
-            reader.readAsText(file);
+                .then(data => alert(data.error || data.message));
+            } else {
+                const resume = interruptedRestore === fileKey
+                    && confirm(`Resume the interrupted restore of ${file.name}?`);
+                restore = importSettings(file, resume ? 'resume' : null)
+                    .then(({ status, data }) => {
+                        if (status === 409 && confirm(`This will replace the existing ${data.tables.join(', ')} data. Continue?`)) {
+                            // Until it succeeds, retrying this file resumes instead of wiping the tables again
+                            interruptedRestore = fileKey;
+                            return importSettings(file, 'replace');
+                        }
+                        return { status, data };
+                    })
+                    .then(({ status, data }) => {
+                        if (status < 500) {
+                            interruptedRestore = null;
+                        }
+                        alert(data.error || data.message);
+                    });
+            }
+            restore
+            .then(() => {
+                loadProviders();
+                loadAgentConfigs();
+            })
+            .catch(error => {
+                console.error('Error:', error);
+                alert('Failed to restore settings. Choose the same file again to resume.');
+            });
         };
         fileInput.click();
     });
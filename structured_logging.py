@@ -0,0 +1,81 @@
+import atexit
+import logging
+import queue
+import random
+import sys
+from logging.handlers import QueueHandler, QueueListener
+
+
+class Truncated:
+    """Log argument that is converted to text, and cut to max_chars, only when emitted.
+
+    Pass it as a %-style logging argument so disabled or sampled-out records
+    never pay for str() of large prompts, payloads or responses.
+    """
+
+    __slots__ = ('value', 'limit')
+    max_chars = 500
+
+    def __init__(self, value, limit=None):
+        self.value = value
+        self.limit = limit
+
+    def __str__(self):
+        text = str(self.value)
+        limit = self.limit or self.max_chars
+        if len(text) <= limit:
+            return text
+        return f"{text[:limit]}... [{len(text) - limit} more chars]"
+
+    __repr__ = __str__
+
+
+class SamplingFilter(logging.Filter):
+    """Keep only a fraction of records logged with extra={'sample_rate': rate}."""
+
+    def filter(self, record):
+        rate = getattr(record, 'sample_rate', None)
+        return rate is None or random.random() < rate
+
+
+class StructuredFormatter(logging.Formatter):
+    """Plain log line followed by key=value pairs from extra={'fields': {...}}."""
+
+    def __init__(self):
+        super().__init__('[%(asctime)s] [%(process)d] [%(levelname)s] %(name)s: %(message)s')
+
+    def format(self, record):
+        line = super().format(record)
+        fields = getattr(record, 'fields', None)
+        if fields:
+            line += ' ' + ' '.join(f'{key}={value}' for key, value in fields.items())
+        return line
+
+
+class DeferredQueueHandler(QueueHandler):
+    # QueueHandler.prepare() formats the record on the calling thread. Skip
+    # that so message formatting happens in the listener thread instead.
+    def prepare(self, record):
+        return record
+
+
+def configure_logging(app):
+    """Route app.logger through a queue drained by a background listener thread.
+
+    Request threads only enqueue records; formatting and file/stream I/O
+    happen on the listener thread.
+    """
+    Truncated.max_chars = app.config['LOG_MAX_BODY_CHARS']
+
+    handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(StructuredFormatter())
+
+    queue_handler = DeferredQueueHandler(queue.SimpleQueue())
+    queue_handler.addFilter(SamplingFilter())
+    listener = QueueListener(queue_handler.queue, handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+
+    app.logger.handlers = [queue_handler]
+    app.logger.setLevel(app.config['LOG_LEVEL'])
+    return listener